@@ -0,0 +1,103 @@
+"""Time the collator's image decode backends and measure their pixel error.
+
+Decodes every image with each backend in `training/image_decode.py` to the
+collator's `image_max_side` target and compares the result with the `pil`
+backend (full decode + resize, the original path): mean/max absolute error per
+channel value and PSNR. Uses synthetic 300-dpi-sized scans (JPEG and PNG)
+unless `--images-dir` is given.
+
+Example:
+  python benchmarks/bench_image_decode.py --image-max-side 1536
+  python benchmarks/bench_image_decode.py --images-dir data/raw/combined --limit 200
+"""
+
+import argparse
+import io
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "training"))
+
+from PIL import Image, ImageChops, ImageDraw  # noqa: E402
+
+from image_decode import DECODERS  # noqa: E402
+from train_qwen3vl_qlora import Collator  # noqa: E402
+
+
+def synth_scans(n: int, seed: int) -> list[tuple[str, bytes]]:
+    """A4 at 300 dpi (2480x3508) pages with text-like strokes; every 4th one is a PNG."""
+    rng = random.Random(seed)
+    out: list[tuple[str, bytes]] = []
+    for i in range(n):
+        img = Image.new("RGB", (2480, 3508), (250, 250, 246))
+        draw = ImageDraw.Draw(img)
+        for _ in range(400):
+            x, y = rng.randrange(2300), rng.randrange(3400)
+            draw.rectangle((x, y, x + rng.randint(20, 180), y + rng.randint(6, 14)), fill=(20, 20, 30))
+        buf = io.BytesIO()
+        fmt = "PNG" if i % 4 == 3 else "JPEG"
+        img.save(buf, fmt, **({"quality": 90} if fmt == "JPEG" else {}))
+        out.append((f"synthetic_{i}.{fmt.lower()}", buf.getvalue()))
+    return out
+
+
+def load_dir(images_dir: Path, limit: int) -> list[tuple[str, bytes]]:
+    paths = sorted(p for p in images_dir.rglob("*") if p.suffix.lower() in {".jpg", ".jpeg", ".png"})
+    return [(p.name, p.read_bytes()) for p in paths[:limit]]
+
+
+def compare(a: Image.Image, b: Image.Image) -> tuple[float, int, float]:
+    """(mean abs error, max abs error, squared error sum) over all channel values."""
+    if a.size != b.size:
+        raise SystemExit(f"MISMATCH: output sizes differ: {a.size} vs {b.size}")
+    hist = ImageChops.difference(a, b).histogram()  # 3 x 256 bins
+    counts = [sum(hist[c * 256 + v] for c in range(3)) for v in range(256)]
+    n = sum(counts)
+    mean = sum(v * c for v, c in enumerate(counts)) / n
+    peak = max((v for v, c in enumerate(counts) if c), default=0)
+    return mean, peak, sum(v * v * c for v, c in enumerate(counts)) / n
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--images-dir", default="", help="benchmark real images instead of synthetic scans")
+    ap.add_argument("--limit", type=int, default=200)
+    ap.add_argument("--synthetic", type=int, default=12, help="number of synthetic scans")
+    ap.add_argument("--image-max-side", type=int, default=1536)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    images = load_dir(Path(args.images_dir), args.limit) if args.images_dir else synth_scans(args.synthetic, args.seed)
+    if not images:
+        raise SystemExit("No images to decode")
+
+    collator = Collator(processor=None, image_max_side=args.image_max_side, max_length=0)
+    target = collator._resize_size
+    reference = {name: DECODERS["pil"](io.BytesIO(data), target) for name, data in images}
+
+    print(f"images: {len(images)}  image_max_side: {args.image_max_side}")
+    base_ms = None
+    for backend, decode in DECODERS.items():
+        best = math.inf
+        for _ in range(max(1, args.repeat)):
+            t0 = time.perf_counter()
+            outs = {name: decode(io.BytesIO(data), target) for name, data in images}
+            best = min(best, time.perf_counter() - t0)
+        ms = 1000 * best / len(images)
+        if backend == "pil":
+            base_ms = ms
+        errs = [compare(outs[name], reference[name]) for name, _ in images]
+        mae = sum(e[0] for e in errs) / len(errs)
+        peak = max(e[1] for e in errs)
+        mse = sum(e[2] for e in errs) / len(errs)
+        psnr = "inf" if mse == 0 else f"{10 * math.log10(255**2 / mse):.1f}dB"
+        speed = f"  ({base_ms / ms:.2f}x)" if base_ms else ""
+        print(f"{backend:>6}: {ms:8.1f} ms/image{speed}  mean|err|={mae:.3f}  max|err|={peak}  PSNR={psnr}")
+
+
+if __name__ == "__main__":
+    main()
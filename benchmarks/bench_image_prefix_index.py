@@ -0,0 +1,84 @@
+"""Compare the legacy linear prefix scan with `PrefixIndex` in the JSONL builder.
+
+Generates a synthetic set of normalized image stems (no files are written) and
+times the image-matching phase of `scripts/build_jsonl_from_results.py` both ways.
+Also asserts that `prefer_image` picks the same path for every document.
+
+Example:
+  python benchmarks/bench_image_prefix_index.py --docs 5000 --images 10000
+"""
+
+import argparse
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "scripts"))
+
+from build_jsonl_from_results import PrefixIndex, norm_key, prefer_image  # noqa: E402
+
+
+def synth_corpus(n_docs: int, n_images: int, seed: int) -> tuple[list[str], list[Path]]:
+    rng = random.Random(seed)
+    filenames = [f"BL {rng.randrange(10**8):08d}-{i}.pdf" for i in range(n_docs)]
+    suffixes = ("_single_page.jpg", "_combined_grid.jpg", "_1.jpg", "_2.png", ".jpg")
+    images: list[Path] = []
+    while len(images) < n_images:
+        fn = rng.choice(filenames)
+        base = fn[:-4]
+        images.append(Path("data/raw/combined") / f"{base}{rng.choice(suffixes)}")
+    # unmatched noise
+    for i in range(n_images // 10):
+        images.append(Path("data/raw/combined") / f"other_{i}.jpg")
+    rng.shuffle(images)
+    return filenames, images
+
+
+def legacy_candidates(norm_to_paths: dict[str, list[Path]], nbase: str) -> list[Path]:
+    candidates: list[Path] = []
+    for k, vs in norm_to_paths.items():
+        if k.startswith(nbase):
+            candidates.extend(vs)
+    return candidates
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=5000)
+    ap.add_argument("--images", type=int, default=10000)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    filenames, images = synth_corpus(args.docs, args.images, args.seed)
+    norm_to_paths: dict[str, list[Path]] = defaultdict(list)
+    for p in images:
+        norm_to_paths[norm_key(p.stem)].append(p)
+    nbases = [norm_key(fn[:-4]) for fn in filenames]
+
+    t0 = time.perf_counter()
+    legacy = [legacy_candidates(norm_to_paths, nb) for nb in nbases]
+    legacy_chosen = [prefer_image(c) if c else None for c in legacy]
+    t_legacy = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    index = PrefixIndex(norm_to_paths)
+    indexed_chosen = []
+    for nb in nbases:
+        c = index.candidates(nb)
+        indexed_chosen.append(prefer_image(c) if c else None)
+    t_indexed = time.perf_counter() - t0
+
+    if legacy_chosen != indexed_chosen:
+        raise SystemExit("MISMATCH: indexed lookup chose different images than the linear scan")
+
+    print(f"docs: {len(nbases)}  images: {len(images)}  keys: {len(norm_to_paths)}")
+    print(f"linear scan: {t_legacy:.3f}s")
+    print(f"prefix index: {t_indexed:.3f}s (includes index build)")
+    if t_indexed > 0:
+        print(f"speedup: {t_legacy / t_indexed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
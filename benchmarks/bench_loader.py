@@ -0,0 +1,150 @@
+"""Compare `--num-workers` dataloader processes with `--prefetch-threads` image prefetching.
+
+Runs one pass over a synthetic corpus (or `--train`) for each loader setting,
+with the training `Collator` and the stand-in processor from `tiny_qwen_vl.py`
+(or `--model`), and reports images/sec, time to the first batch and peak
+resident memory of the main process plus its worker processes. A `delay`
+stands in for the training step, so decoding can overlap with it.
+
+RSS of forked workers counts pages shared with the parent in each process;
+PSS (proportional set size, shared pages split between processes) is printed
+as well where the OS reports it.
+
+Example:
+  python benchmarks/bench_loader.py --records 256 --workers 0,2,4 --threads 4,8
+  python benchmarks/bench_loader.py --train data/train.sft.jsonl --model Qwen/Qwen3-VL-8B-Instruct --limit 500
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import psutil
+from datasets import load_dataset
+from torch.utils.data import DataLoader
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "training"))
+
+from prefetch import PrefetchBatches, collate_features, unbatched  # noqa: E402
+from tiny_qwen_vl import build_processor, synth_records  # noqa: E402
+from train_qwen3vl_qlora import Collator  # noqa: E402
+
+
+class MemoryPeak:
+    """Sample RSS/PSS of a process (default: this one) and its children in a background thread."""
+
+    def __init__(self, process: psutil.Process | None = None, interval: float = 0.05):
+        self.process = process or psutil.Process()
+        self.interval = interval
+        self.rss = self.pss = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self) -> None:
+        rss = pss = 0
+        try:
+            tree = [self.process, *self.process.children(recursive=True)]
+        except psutil.Error:
+            return
+        for p in tree:
+            try:
+                info = p.memory_full_info()
+            except (psutil.Error, OSError):
+                continue
+            rss += info.rss
+            pss += getattr(info, "pss", 0)
+        self.rss = max(self.rss, rss)
+        self.pss = max(self.pss, pss)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "MemoryPeak":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def run(loader, delay: float) -> tuple[int, float, float, int, int]:
+    """(images, first batch seconds, total seconds, peak RSS, peak PSS) of one pass."""
+    images = 0
+    first = 0.0
+    with MemoryPeak() as mem:
+        t0 = time.perf_counter()
+        for batch in loader:
+            if not first:
+                first = time.perf_counter() - t0
+            images += int(batch["image_grid_thw"].shape[0])
+            if delay:
+                time.sleep(delay)
+        total = time.perf_counter() - t0
+    return images, first, total, mem.rss, mem.pss
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--train", default="", help="training JSONL to load (default: synthetic corpus)")
+    ap.add_argument("--model", default="", help="processor to use (default: stand-in processor)")
+    ap.add_argument("--limit", type=int, default=0, help="use only the first N records of --train")
+    ap.add_argument("--records", type=int, default=128, help="synthetic records")
+    ap.add_argument("--batch", type=int, default=4)
+    ap.add_argument("--max-len", type=int, default=4096)
+    ap.add_argument("--image-max-side", type=int, default=1536)
+    ap.add_argument("--workers", default="0,2,4", help="--num-workers values to run")
+    ap.add_argument("--threads", default="4,8", help="--prefetch-threads values to run")
+    ap.add_argument("--prefetch-batches", type=int, default=4)
+    ap.add_argument("--delay-ms", type=float, default=0.0, help="simulated training step per batch")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_dir = Path(tmp)
+        if args.model:
+            from transformers import AutoProcessor
+
+            processor = AutoProcessor.from_pretrained(args.model, trust_remote_code=True)
+        else:
+            processor = build_processor(tmp_dir / "processor")
+        train = args.train
+        if not train:
+            train = str(tmp_dir / "train.jsonl")
+            with open(train, "w", encoding="utf-8") as f:
+                for r in synth_records(args.records, tmp_dir, seed=args.seed):
+                    f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        dataset = load_dataset("json", data_files={"train": train}, cache_dir=str(tmp_dir / "hf"))["train"]
+        if args.limit:
+            dataset = dataset.select(range(min(args.limit, len(dataset))))
+        collator = Collator(processor, args.image_max_side, args.max_len)
+        delay = args.delay_ms / 1000
+
+        print(f"records: {len(dataset)}  batch: {args.batch}  delay: {args.delay_ms:g} ms/batch")
+        settings = [("num-workers", int(n)) for n in args.workers.split(",") if n != ""]
+        settings += [("prefetch-threads", int(n)) for n in args.threads.split(",") if n != ""]
+        for mode, n in settings:
+            if mode == "num-workers":
+                loader = DataLoader(dataset, batch_size=args.batch, collate_fn=collator, num_workers=n)
+            else:
+                # the same wrapping Qwen3VLTrainer hands to accelerate
+                base = DataLoader(dataset, batch_size=args.batch, collate_fn=collate_features)
+                batches = PrefetchBatches(base, collator, threads=n, batches=args.prefetch_batches)
+                loader = DataLoader(batches, batch_size=None, collate_fn=unbatched)
+            images, first, total, rss, pss = run(loader, delay)
+            pss_text = f"  peak PSS {pss / 2**20:7.0f} MiB" if pss else ""
+            print(
+                f"--{mode} {n:<2}: {images / total:7.1f} images/s  first batch {first:5.2f}s  "
+                f"peak RSS {rss / 2**20:7.0f} MiB{pss_text}"
+            )
+
+
+if __name__ == "__main__":
+    main()
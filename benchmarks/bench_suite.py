@@ -0,0 +1,272 @@
+"""CPU throughput benchmark of the data pipeline, for comparing commits.
+
+Generates a synthetic corpus (a `results.json` export with one row per
+container plus page scans named like the real extractions), then runs each
+stage as its own process:
+
+- `build_jsonl`: `scripts/build_jsonl_from_results.py` (in-memory grouping)
+- `build_jsonl_stream`: the same with `--stream --group-mode sorted`
+- `split`: `scripts/split_jsonl.py`
+- `convert`: `training/convert_splits_to_sft_jsonl.py`
+- `collate[<decoder>]`: the training `Collator` over the converted records,
+  with the stand-in processor from `tiny_qwen_vl.py`, once per `--decoders` entry
+
+and reports records/sec, images/sec, tokens/sec (collator) and peak RSS of
+each stage. Script stages are timed including interpreter startup; use enough
+`--docs` that it does not dominate. Results go to `--out` as JSON; with
+`--compare` the throughput change against an earlier results file is printed.
+
+Example:
+  python benchmarks/bench_suite.py --docs 500 --out bench/HEAD.json
+  python benchmarks/bench_suite.py --docs 500 --out bench/new.json --compare bench/HEAD.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+import psutil
+
+REPO = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO / "training"))
+
+from bench_loader import MemoryPeak  # noqa: E402
+from tiny_qwen_vl import build_processor, synth_page  # noqa: E402
+
+RESULTS_VERSION = 1
+RATES = ("records_per_s", "images_per_s", "tokens_per_s")
+
+
+def synth_corpus(
+    work: Path, docs: int, seed: int, max_containers: int, min_side: int, max_side: int, missing: float
+) -> tuple[int, int]:
+    """Write `results.json` and `images/` under `work`; returns (rows, images)."""
+    rng = random.Random(seed)
+    img_dir = work / "images"
+    img_dir.mkdir(parents=True, exist_ok=True)
+    rows: list[dict[str, Any]] = []
+    images = 0
+    for i in range(docs):
+        fn = f"BL {rng.randrange(10**8):08d}-{i}.pdf"
+        shared = {
+            "Filename": fn,
+            "consignee_name": f"Consignee {i}",
+            "bl_number": f"BL{rng.randrange(10**8):08d}",
+            "port_of_loading": "Shanghai",
+            "port_of_discharge": "Rotterdam",
+            "vessel_name": f"Vessel {rng.randrange(100)}",
+            "detention_free_days": str(rng.choice([7, 14, 21])),
+            "demurrage_free_days": str(rng.choice([7, 14])),
+            "combined_free_days": "",
+        }
+        for _ in range(rng.randint(1, max_containers)):
+            rows.append(
+                {
+                    **shared,
+                    "Container_Number": f"MSCU{rng.randrange(10**7):07d}",
+                    "Container_Size": rng.choice(["20", "40"]),
+                    "Container_Type": rng.choice(["GP", "HC"]),
+                }
+            )
+        if rng.random() >= missing:
+            page = synth_page(rng, rng.randint(min_side, max_side), rng.randint(min_side, max_side))
+            page.save(img_dir / f"{fn[:-4]}_single_page.jpg", quality=85)
+            images += 1
+    (work / "results.json").write_text(json.dumps(rows, ensure_ascii=False), encoding="utf-8")
+    return len(rows), images
+
+
+def count_lines(path: Path) -> int:
+    with path.open("rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+def run_stage(cmd: list[str], cwd: Path) -> tuple[float, int, str]:
+    """(seconds, peak RSS bytes, stdout) of one stage process."""
+    t0 = time.perf_counter()
+    env = {**os.environ, "PYTHONHASHSEED": "0"}
+    proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env)
+    with MemoryPeak(psutil.Process(proc.pid), interval=0.01) as mem:
+        out, err = proc.communicate()
+    seconds = time.perf_counter() - t0
+    if proc.returncode:
+        raise SystemExit(f"Stage failed ({' '.join(cmd)}):\n{err}")
+    return seconds, mem.rss, out
+
+
+def collate_main(args: argparse.Namespace) -> None:
+    """Child process of the `collate[...]` stages: print one JSON line of counts and seconds."""
+    from transformers import AutoProcessor
+
+    from train_qwen3vl_qlora import Collator
+
+    processor = AutoProcessor.from_pretrained(args.processor)
+    with open(args.collate, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    collator = Collator(processor, args.image_max_side, args.max_len, decoder=args.decoder)
+    collator(records[: args.batch])  # warm-up: lazy imports, first tokenizer call
+    images = tokens = 0
+    t0 = time.perf_counter()
+    for start in range(0, len(records), args.batch):
+        batch = collator(records[start : start + args.batch])
+        images += int(batch["image_grid_thw"].shape[0])
+        tokens += int(batch["attention_mask"].sum())
+    seconds = time.perf_counter() - t0
+    print(json.dumps({"records": len(records), "images": images, "tokens": tokens, "seconds": seconds}))
+
+
+def stage_result(
+    seconds: float, rss: int, records: int, images: int | None = None, tokens: int | None = None
+) -> dict[str, Any]:
+    return {
+        "seconds": round(seconds, 4),
+        "records": records,
+        "images": images,
+        "records_per_s": round(records / seconds, 2),
+        "images_per_s": round(images / seconds, 2) if images is not None else None,
+        "tokens_per_s": round(tokens / seconds, 1) if tokens is not None else None,
+        "peak_rss_mib": round(rss / 2**20, 1),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def print_comparison(results: dict[str, Any], baseline_path: Path) -> None:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    print(f"\nvs {baseline_path} ({baseline.get('commit') or 'unknown commit'}):")
+    if baseline.get("corpus") != results["corpus"]:
+        print(f"  note: different corpus ({baseline.get('corpus')} vs {results['corpus']}); rates are not comparable")
+    for name, stage in results["stages"].items():
+        old = baseline.get("stages", {}).get(name)
+        if old is None:
+            print(f"  {name:<24} (new stage)")
+            continue
+        parts = []
+        for key in RATES:
+            if stage.get(key) and old.get(key):
+                parts.append(f"{key[:-6]}/s {100 * (stage[key] / old[key] - 1):+.1f}%")
+        if old.get("peak_rss_mib"):
+            parts.append(f"RSS {100 * (stage['peak_rss_mib'] / old['peak_rss_mib'] - 1):+.1f}%")
+        print(f"  {name:<24} " + "  ".join(parts))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--docs", type=int, default=300, help="synthetic documents")
+    ap.add_argument("--max-containers", type=int, default=20, help="container rows per document (1..N)")
+    ap.add_argument("--min-side", type=int, default=600)
+    ap.add_argument("--max-side", type=int, default=2400)
+    ap.add_argument("--missing", type=float, default=0.05, help="share of documents without an image")
+    ap.add_argument("--batch", type=int, default=4, help="collator batch size")
+    ap.add_argument("--max-len", type=int, default=8192)
+    ap.add_argument("--image-max-side", type=int, default=1536)
+    ap.add_argument("--decoders", default="pil,draft", help="one collate stage per decoder")
+    ap.add_argument("--repeat", type=int, default=1, help="runs per stage; the fastest is kept")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--work-dir", default="", help="keep the corpus and outputs here (default: temp dir)")
+    ap.add_argument("--out", default="bench_results.json", help="results JSON")
+    ap.add_argument("--compare", default="", help="earlier results JSON to compare against")
+    # internal: run the collator stage in this (child) process
+    ap.add_argument("--collate", default="", help=argparse.SUPPRESS)
+    ap.add_argument("--processor", default="", help=argparse.SUPPRESS)
+    ap.add_argument("--decoder", default="pil", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.collate:
+        collate_main(args)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(args.work_dir or tmp).resolve()
+        work.mkdir(parents=True, exist_ok=True)
+        t0 = time.perf_counter()
+        n_rows, n_images = synth_corpus(
+            work, args.docs, args.seed, args.max_containers, args.min_side, args.max_side, args.missing
+        )
+        build_processor(work / "processor")
+        print(
+            f"corpus: {args.docs} docs, {n_rows} rows, {n_images} images ({time.perf_counter() - t0:.1f}s) in {work}"
+        )
+
+        py = sys.executable
+        build = [py, str(REPO / "scripts" / "build_jsonl_from_results.py"), "--results", "results.json"]
+        build += ["--images-dir", "images", "--prompt", str(REPO / "prompts" / "bl_extraction_prompt.txt")]
+        build += ["--skip-missing-images"]
+        split = [py, str(REPO / "scripts" / "split_jsonl.py"), "--in", "train.jsonl", "--out-dir", "splits"]
+        convert = [py, str(REPO / "training" / "convert_splits_to_sft_jsonl.py"), "--in", "splits/train.jsonl"]
+        convert += ["--out", "train.sft.jsonl"]
+        stages: list[tuple[str, list[str]]] = [
+            ("build_jsonl", build + ["--out", "train.jsonl"]),
+            ("build_jsonl_stream", build + ["--out", "train.stream.jsonl", "--stream", "--group-mode", "sorted"]),
+            ("split", split),
+            ("convert", convert),
+        ]
+        for decoder in [d for d in args.decoders.split(",") if d]:
+            collate = [py, str(Path(__file__).resolve()), "--collate", "train.sft.jsonl", "--processor", "processor"]
+            collate += ["--decoder", decoder, "--batch", str(args.batch), "--max-len", str(args.max_len)]
+            collate += ["--image-max-side", str(args.image_max_side)]
+            stages.append((f"collate[{decoder}]", collate))
+
+        results: dict[str, Any] = {
+            "version": RESULTS_VERSION,
+            "commit": git_commit(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("collate", "processor", "decoder")},
+            "corpus": {"docs": args.docs, "rows": n_rows, "images": n_images},
+            "stages": {},
+        }
+        for name, cmd in stages:
+            best: dict[str, Any] | None = None
+            for _ in range(max(1, args.repeat)):
+                seconds, rss, out = run_stage(cmd, work)
+                if name.startswith("collate"):
+                    counts = json.loads(out.strip().splitlines()[-1])
+                    result = stage_result(counts["seconds"], rss, counts["records"], counts["images"], counts["tokens"])
+                elif name.startswith("build_jsonl"):
+                    # --skip-missing-images: one matched image per written record
+                    written = count_lines(work / cmd[cmd.index("--out") + 1])
+                    result = stage_result(seconds, rss, written, written)
+                elif name == "split":
+                    result = stage_result(seconds, rss, count_lines(work / "train.jsonl"))
+                else:
+                    result = stage_result(seconds, rss, count_lines(work / "train.sft.jsonl"))
+                if best is None or result["seconds"] < best["seconds"]:
+                    best = result
+            results["stages"][name] = best
+            images = f"  {best['images_per_s']:8.1f} images/s" if best["images_per_s"] is not None else ""
+            tokens = f"  {best['tokens_per_s']:9.0f} tokens/s" if best["tokens_per_s"] is not None else ""
+            print(
+                f"{name:<24} {best['seconds']:7.2f}s  {best['records_per_s']:9.1f} records/s"
+                f"{images}{tokens}  peak RSS {best['peak_rss_mib']:7.1f} MiB"
+            )
+
+    out_path = Path(args.out)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    tmp_path.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    os.replace(tmp_path, out_path)
+    print(f"results -> {out_path}")
+    if args.compare:
+        print_comparison(results, Path(args.compare))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Stand-ins for CPU benchmarks: a tiny Qwen3-VL processor/model and a synthetic corpus.
+
+Nothing is downloaded. The processor pairs a character-level tokenizer (with
+the Qwen-VL special tokens) with the real Qwen2-VL image processor (patch 16,
+merge 2), so image-token counts, `image_grid_thw` and `pixel_values` behave like
+the real model's. The model is a randomly initialised Qwen3-VL with a few
+thousand times fewer parameters.
+"""
+
+import json
+import random
+import string
+from pathlib import Path
+from typing import Any
+
+SPECIAL_TOKENS = [
+    "<|endoftext|>",
+    "<|im_start|>",
+    "<|im_end|>",
+    "<|vision_start|>",
+    "<|vision_end|>",
+    "<|image_pad|>",
+    "<|video_pad|>",
+]
+CHAT_TEMPLATE = (
+    "{% for m in messages %}<|im_start|>{{ m['role'] }}\n{% for c in m['content'] %}"
+    "{% if c['type'] == 'image' %}<|vision_start|><|image_pad|><|vision_end|>{% else %}{{ c['text'] }}{% endif %}"
+    "{% endfor %}<|im_end|>\n{% endfor %}{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+)
+
+
+def build_processor(out_dir: Path, min_pixels: int = 64 * 64, max_pixels: int = 1024 * 1024) -> Any:
+    """Save a stand-in Qwen3-VL processor to `out_dir` and load it back with AutoProcessor."""
+    from tokenizers import Tokenizer, models, pre_tokenizers
+    from transformers import AutoProcessor, Qwen2TokenizerFast, Qwen2VLImageProcessor
+    from transformers.models.qwen3_vl import Qwen3VLProcessor
+    from transformers.models.qwen3_vl.video_processing_qwen3_vl import Qwen3VLVideoProcessor
+
+    vocab = {t: i for i, t in enumerate(SPECIAL_TOKENS)}
+    for ch in string.printable:
+        vocab.setdefault(ch, len(vocab))
+    vocab["[UNK]"] = len(vocab)
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    backend.pre_tokenizer = pre_tokenizers.Split("", behavior="isolated")
+    backend.add_special_tokens(SPECIAL_TOKENS)
+    tokenizer = Qwen2TokenizerFast(
+        tokenizer_object=backend, unk_token="[UNK]", pad_token="<|endoftext|>", eos_token="<|im_end|>"
+    )
+    tokenizer.chat_template = CHAT_TEMPLATE
+    image_processor = Qwen2VLImageProcessor(
+        patch_size=16, merge_size=2, temporal_patch_size=2, min_pixels=min_pixels, max_pixels=max_pixels
+    )
+    processor = Qwen3VLProcessor(
+        image_processor=image_processor,
+        tokenizer=tokenizer,
+        video_processor=Qwen3VLVideoProcessor(),
+        chat_template=CHAT_TEMPLATE,
+    )
+    processor.save_pretrained(str(out_dir))
+    return AutoProcessor.from_pretrained(str(out_dir))
+
+
+def tiny_model(processor: Any, seed: int = 0, attn_implementation: str = "sdpa") -> Any:
+    """Randomly initialised Qwen3-VL sized for CPU (2 text layers, 2 vision blocks)."""
+    import torch
+    from transformers import Qwen3VLConfig, Qwen3VLForConditionalGeneration
+
+    tok = processor.tokenizer
+    config = Qwen3VLConfig(
+        text_config={
+            "vocab_size": len(tok),
+            "hidden_size": 64,
+            "intermediate_size": 128,
+            "num_hidden_layers": 2,
+            "num_attention_heads": 4,
+            "num_key_value_heads": 2,
+            "head_dim": 16,
+            "max_position_embeddings": 32768,
+            "rope_scaling": {"rope_type": "default", "mrope_section": [2, 3, 3], "mrope_interleaved": True},
+        },
+        vision_config={
+            "depth": 2,
+            "hidden_size": 32,
+            "intermediate_size": 64,
+            "num_heads": 2,
+            "out_hidden_size": 64,
+            "patch_size": 16,
+            "spatial_merge_size": 2,
+            "temporal_patch_size": 2,
+            "num_position_embeddings": 64,
+            "deepstack_visual_indexes": [0],
+        },
+        image_token_id=tok.convert_tokens_to_ids("<|image_pad|>"),
+        video_token_id=tok.convert_tokens_to_ids("<|video_pad|>"),
+        vision_start_token_id=tok.convert_tokens_to_ids("<|vision_start|>"),
+        vision_end_token_id=tok.convert_tokens_to_ids("<|vision_end|>"),
+    )
+    config._attn_implementation = attn_implementation
+    config.text_config._attn_implementation = attn_implementation
+    torch.manual_seed(seed)
+    return Qwen3VLForConditionalGeneration(config)
+
+
+def synth_page(rng: random.Random, w: int, h: int) -> Any:
+    """White w x h page with random black text-line strokes."""
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (w, h), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    for _ in range(20):
+        x, y = rng.randrange(w), rng.randrange(h)
+        draw.rectangle((x, y, x + rng.randint(5, w // 4 + 5), y + 8), fill=(0, 0, 0))
+    return img
+
+
+def synth_records(
+    n: int,
+    out_dir: Path,
+    seed: int = 0,
+    min_side: int = 200,
+    max_side: int = 2400,
+    max_containers: int = 40,
+) -> list[dict[str, Any]]:
+    """Write `n` synthetic scans (JPEG, random sizes) and return {id, image, prompt, response} records."""
+    rng = random.Random(seed)
+    img_dir = out_dir / "images"
+    img_dir.mkdir(parents=True, exist_ok=True)
+    prompt = (
+        "From the image, extract the following details and return them as a JSON object with these exact keys:\n"
+        "'consignee_name', 'bl_number', 'port_of_loading', 'port_of_discharge', 'vessel_name', 'container_details'"
+    )
+    records: list[dict[str, Any]] = []
+    for i in range(n):
+        img = synth_page(rng, rng.randint(min_side, max_side), rng.randint(min_side, max_side))
+        path = img_dir / f"doc_{i:05d}.jpg"
+        img.save(path, quality=85)
+        containers = [
+            {"container_number": f"MSCU{rng.randrange(10**7):07d}", "seal_number": str(rng.randrange(10**6))}
+            for _ in range(rng.randint(1, max_containers))
+        ]
+        response = {
+            "consignee_name": f"Consignee {i}",
+            "bl_number": f"BL{rng.randrange(10**8):08d}",
+            "port_of_loading": "Shanghai",
+            "port_of_discharge": "Rotterdam",
+            "vessel_name": f"Vessel {rng.randrange(100)}",
+            "container_details": containers,
+        }
+        records.append(
+            {"id": f"doc_{i:05d}", "image": str(path), "prompt": prompt, "response": json.dumps(response)}
+        )
+    return records
@@ -1,9 +1,19 @@
 import argparse
+import bisect
+import hashlib
+import heapq
 import json
+import os
 import re
+import tempfile
+import zlib
 from collections import defaultdict
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator
+
+from image_manifest import scan_images
+
+_WS = re.compile(r"[ \t\n\r]*")
 
 
 def norm_key(s: str) -> str:
@@ -37,6 +47,35 @@ def prefer_image(paths: list[Path]) -> Path:
     return sorted(paths, key=score)[0]
 
 
+class PrefixIndex:
+    """Sorted view over normalized image stems for prefix lookups.
+
+    Equivalent to scanning every key with `k.startswith(prefix)`, but uses bisect
+    to jump to the first candidate so a lookup costs O(log n + matches).
+    Candidates are returned in the insertion order of `norm_to_paths`, so
+    `prefer_image` ties resolve exactly as with the linear scan.
+    """
+
+    def __init__(self, norm_to_paths: dict[str, list[Path]]):
+        self._norm_to_paths = norm_to_paths
+        self._order = {k: i for i, k in enumerate(norm_to_paths)}
+        self._keys = sorted(norm_to_paths)
+
+    def candidates(self, prefix: str) -> list[Path]:
+        keys = self._keys
+        i = bisect.bisect_left(keys, prefix)
+        matched: list[str] = []
+        while i < len(keys) and keys[i].startswith(prefix):
+            matched.append(keys[i])
+            i += 1
+        if len(matched) > 1:
+            matched.sort(key=self._order.__getitem__)
+        out: list[Path] = []
+        for k in matched:
+            out.extend(self._norm_to_paths[k])
+        return out
+
+
 def normalize_port_of_discharge(value: str) -> str:
     v = (value or "").strip()
     u = v.upper()
@@ -59,6 +98,403 @@ def to_str_or_empty(v: Any) -> str:
     return str(v)
 
 
+# longest token the decoder can reject while it is still incomplete (a \uXXXX escape, "false")
+_EDGE = 8
+
+
+def iter_json_array(path: Path, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array one at a time.
+
+    Reads `chunk_size` characters at a time, so memory is bounded by the largest
+    single element rather than the whole file.
+    """
+    decoder = json.JSONDecoder()
+    with path.open("r", encoding="utf-8") as f:
+        buf = ""
+        pos = 0
+        eof = False
+
+        def fill() -> None:
+            nonlocal buf, pos, eof
+            chunk = f.read(chunk_size)
+            if not chunk:
+                eof = True
+            buf = buf[pos:] + chunk
+            pos = 0
+
+        def skip_ws() -> None:
+            nonlocal pos
+            while True:
+                pos = _WS.match(buf, pos).end()
+                if pos < len(buf) or eof:
+                    return
+                fill()
+
+        fill()
+        skip_ws()
+        if buf[pos : pos + 1] != "[":
+            raise ValueError(f"{path}: expected a top-level JSON array")
+        pos += 1
+        skip_ws()
+        if buf[pos : pos + 1] == "]":
+            return
+
+        while True:
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as e:
+                # Only an error at the buffer edge can be a value cut off by the chunking;
+                # anything earlier is invalid JSON, reported without reading to EOF.
+                if eof or not (e.msg.startswith("Unterminated string") or e.pos >= len(buf) - _EDGE):
+                    raise
+                fill()
+                continue
+            if not eof:
+                # Only trust a value once its separator is buffered; a number at the
+                # buffer edge may be truncated (e.g. "1" of "1e5").
+                nxt = _WS.match(buf, end).end()
+                if buf[nxt : nxt + 1] not in (",", "]"):
+                    fill()
+                    continue
+            yield obj
+            pos = end
+            skip_ws()
+            sep = buf[pos : pos + 1]
+            pos += 1
+            if sep == "]":
+                return
+            if sep != ",":
+                raise ValueError(f"{path}: expected ',' or ']' in top-level array, got {sep!r}")
+            skip_ws()
+
+
+def new_entry(r: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "Filename": r.get("Filename"),
+        "consignee_name": r.get("consignee_name", ""),
+        "bl_number": r.get("bl_number", ""),
+        "port_of_loading": r.get("port_of_loading", ""),
+        "port_of_discharge": r.get("port_of_discharge", ""),
+        "vessel_name": r.get("vessel_name", ""),
+        "detention_free_days": r.get("detention_free_days"),
+        "demurrage_free_days": r.get("demurrage_free_days"),
+        "combined_free_days": r.get("combined_free_days"),
+        "container_details": [],
+        "_seen_containers": set(),
+    }
+
+
+def add_container(entry: dict[str, Any], r: dict[str, Any]) -> None:
+    cnum = (r.get("Container_Number") or "").strip()
+    if cnum and cnum not in entry["_seen_containers"]:
+        entry["_seen_containers"].add(cnum)
+        entry["container_details"].append(
+            {
+                "container_number": cnum,
+                "container_size": to_str_or_empty(r.get("Container_Size")),
+                "container_type": to_str_or_empty(r.get("Container_Type")),
+            }
+        )
+
+
+def group_rows(rows: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Group container rows into one entry per Filename, in first-appearance order."""
+    by_file: dict[str, dict[str, Any]] = {}
+    for r in rows:
+        fn = r.get("Filename")
+        if not fn:
+            continue
+        entry = by_file.get(fn)
+        if entry is None:
+            entry = new_entry(r)
+            by_file[fn] = entry
+        add_container(entry, r)
+    return list(by_file.values())
+
+
+def iter_sorted_groups(rows: Iterable[dict[str, Any]]) -> Iterator[dict[str, Any]]:
+    """Fast path for rows already contiguous by Filename: emit each group as it closes.
+
+    Only the set of finished filenames is kept, to detect input that is not grouped, so
+    memory grows with the number of distinct filenames (not with the number of rows).
+    """
+    done: set[Any] = set()
+    entry: dict[str, Any] | None = None
+    for r in rows:
+        fn = r.get("Filename")
+        if not fn:
+            continue
+        if entry is None or entry["Filename"] != fn:
+            if fn in done:
+                raise SystemExit(
+                    f"Rows are not grouped by Filename ({fn!r} reappears); use --group-mode spill"
+                )
+            if entry is not None:
+                yield entry
+            done.add(fn)
+            entry = new_entry(r)
+        add_container(entry, r)
+    if entry is not None:
+        yield entry
+
+
+def iter_spilled_groups(
+    rows: Iterable[dict[str, Any]], spill_dir: str | None, partitions: int
+) -> Iterator[dict[str, Any]]:
+    """Bounded-memory grouping: hash-partition rows to disk, group each partition,
+    then merge the per-partition groups back into first-appearance order.
+
+    Peak memory is roughly one partition (total rows / `partitions`).
+    """
+    partitions = max(1, partitions)
+    with tempfile.TemporaryDirectory(prefix="build_jsonl_spill_", dir=spill_dir) as tmp:
+        tmp_dir = Path(tmp)
+        part_paths = [tmp_dir / f"part_{i:04d}.jsonl" for i in range(partitions)]
+        part_files = [p.open("w", encoding="utf-8") for p in part_paths]
+        try:
+            for idx, r in enumerate(rows):
+                fn = r.get("Filename")
+                if not fn:
+                    continue
+                pi = zlib.crc32(str(fn).encode("utf-8")) % partitions
+                part_files[pi].write(json.dumps([idx, r], ensure_ascii=False) + "\n")
+        finally:
+            for pf in part_files:
+                pf.close()
+
+        # Group each partition in memory; all rows of a Filename share a partition, so the
+        # first row index seen for it is its global first-appearance position.
+        run_paths: list[Path] = []
+        for pi, part_path in enumerate(part_paths):
+            by_file: dict[Any, tuple[int, dict[str, Any]]] = {}
+            with part_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    idx, r = json.loads(line)
+                    fn = r.get("Filename")
+                    item = by_file.get(fn)
+                    if item is None:
+                        item = (idx, new_entry(r))
+                        by_file[fn] = item
+                    add_container(item[1], r)
+            part_path.unlink()
+
+            run_path = tmp_dir / f"run_{pi:04d}.jsonl"
+            with run_path.open("w", encoding="utf-8") as f:
+                for idx, entry in sorted(by_file.values(), key=lambda t: t[0]):
+                    entry.pop("_seen_containers", None)
+                    f.write(json.dumps([idx, entry], ensure_ascii=False) + "\n")
+            run_paths.append(run_path)
+            del by_file
+
+        run_files = [p.open("r", encoding="utf-8") for p in run_paths]
+        try:
+            runs = [(json.loads(line) for line in rf) for rf in run_files]
+            for _, entry in heapq.merge(*runs, key=lambda t: t[0]):
+                yield entry
+        finally:
+            for rf in run_files:
+                rf.close()
+
+
+def build_record(fn: str, entry: dict[str, Any], image_rel: str, prompt_text: str) -> dict[str, Any]:
+    container_details = entry["container_details"]
+    total_expected = len(container_details) if container_details else None
+
+    assistant_obj = {
+        "consignee_name": to_str_or_empty(entry.get("consignee_name")),
+        "bl_number": to_str_or_empty(entry.get("bl_number")),
+        "port_of_loading": to_str_or_empty(entry.get("port_of_loading")),
+        "port_of_discharge": normalize_port_of_discharge(to_str_or_empty(entry.get("port_of_discharge"))),
+        "vessel_name": to_str_or_empty(entry.get("vessel_name")),
+        "detention_free_days": to_str_or_empty(entry.get("detention_free_days")),
+        "demurrage_free_days": to_str_or_empty(entry.get("demurrage_free_days")),
+        "combined_free_days": to_str_or_empty(entry.get("combined_free_days")),
+        "total_expected_containers": total_expected,
+        "container_details": container_details,
+    }
+
+    record = {
+        "id": norm_key(fn),
+        "messages": [
+            {
+                "role": "system",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": "Return ONLY valid JSON. No extra text.",
+                    }
+                ],
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image",
+                        "image": image_rel if image_rel else "",
+                    },
+                    {"type": "text", "text": prompt_text},
+                ],
+            },
+            {
+                "role": "assistant",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": json.dumps(assistant_obj, ensure_ascii=False),
+                    }
+                ],
+            },
+        ],
+        "meta": {
+            "filename": fn,
+            "image_rel": image_rel,
+        },
+    }
+    return record
+
+
+STATE_VERSION = 1
+
+
+class IncrementalBuild:
+    """Splice an existing output with only the records whose inputs changed.
+
+    The state file maps each Filename to a hash of its grouped rows, the chosen image
+    signature (path, size, mtime_ns, from a fresh stat of the file) and the byte range
+    of its line in the previous output. Only added or changed groups go through
+    `build_record`; unchanged records are copied from the previous output as raw bytes,
+    consecutive ones in a single block copy. Every row is still parsed, grouped and
+    hashed, since results.json carries no change markers.
+    """
+
+    def __init__(self, out_path: Path, state_path: Path, settings: dict[str, Any]):
+        self.out_path = out_path
+        self.state_path = state_path
+        self.settings = settings
+        self.tmp_path = out_path.with_name(out_path.name + ".tmp")
+        self.prev: dict[str, list[Any]] = {}
+        self.records: dict[str, list[Any]] = {}
+        self.added: list[str] = []
+        self.changed_data: list[str] = []
+        self.changed_image: list[str] = []
+        self.unchanged = 0
+        self.reason = ""
+        self._old = None
+        self._pos = 0
+        self._run: list[int] | None = None  # [offset, length] of pending unchanged lines in the old output
+
+        state = None
+        if state_path.exists():
+            try:
+                state = json.loads(state_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                state = None
+        if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+            self.reason = "no previous state"
+        elif state.get("settings") != settings:
+            self.reason = "prompt or build settings changed"
+        elif not out_path.exists() or state.get("output") != self._output_sig():
+            self.reason = "output file changed since last build"
+        else:
+            self.prev = state.get("records") or {}
+            self._old = out_path.open("rb")
+
+    def _output_sig(self) -> list[int]:
+        st = self.out_path.stat()
+        return [st.st_size, st.st_mtime_ns]
+
+    @staticmethod
+    def group_hash(entry: dict[str, Any]) -> str:
+        data = {k: v for k, v in entry.items() if k != "_seen_containers"}
+        raw = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def image_sig(path: Path, image_rel: str) -> list[Any]:
+        try:
+            st = path.stat()
+        except OSError:
+            return [image_rel, 0, 0]
+        return [image_rel, st.st_size, st.st_mtime_ns]
+
+    def _flush_run(self, out: Any) -> None:
+        if self._run is None:
+            return
+        offset, remaining = self._run
+        self._run = None
+        self._old.seek(offset)
+        while remaining:
+            chunk = self._old.read(min(remaining, 1 << 20))
+            if not chunk:
+                raise OSError(f"{self.out_path} is shorter than its incremental state says")
+            out.write(chunk)
+            remaining -= len(chunk)
+
+    def emit(
+        self,
+        out: Any,
+        fn: str,
+        entry: dict[str, Any],
+        image_rel: str,
+        image_sig: list[Any],
+        prompt_text: str,
+    ) -> None:
+        gh = self.group_hash(entry)
+        prev = self.prev.get(fn)
+        if prev is not None and prev[0] == gh and prev[1] == image_sig:
+            self.unchanged += 1
+            offset, length = prev[2], prev[3]
+            if self._run is not None and self._run[0] + self._run[1] == offset:
+                self._run[1] += length
+            else:
+                self._flush_run(out)
+                self._run = [offset, length]
+            self.records[fn] = [gh, image_sig, self._pos, length]
+            self._pos += length
+            return
+
+        if prev is None:
+            self.added.append(fn)
+        elif prev[0] != gh:
+            self.changed_data.append(fn)
+        else:
+            self.changed_image.append(fn)
+        self._flush_run(out)
+        record = build_record(fn, entry, image_rel, prompt_text)
+        # match the platform newline of the text-mode full build
+        line = (json.dumps(record, ensure_ascii=False) + os.linesep).encode("utf-8")
+        self.records[fn] = [gh, image_sig, self._pos, len(line)]
+        self._pos += len(line)
+        out.write(line)
+
+    def finish(self, out: Any) -> None:
+        """Write what is still pending; call before the output file is closed."""
+        self._flush_run(out)
+
+    def commit(self) -> dict[str, Any]:
+        if self._old is not None:
+            self._old.close()
+        os.replace(self.tmp_path, self.out_path)
+        removed = [fn for fn in self.prev if fn not in self.records]
+        state = {
+            "version": STATE_VERSION,
+            "settings": self.settings,
+            "output": self._output_sig(),
+            "records": self.records,
+        }
+        tmp_state = self.state_path.with_name(self.state_path.name + ".tmp")
+        tmp_state.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_state, self.state_path)
+        return {
+            "full_rebuild_reason": self.reason,
+            "added": self.added,
+            "changed_data": self.changed_data,
+            "changed_image": self.changed_image,
+            "removed": removed,
+            "unchanged": self.unchanged,
+        }
+
+
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--results", default="docs/results.json")
@@ -68,6 +504,12 @@ def main() -> None:
         default=[],
         help="directory containing extracted images (repeatable)",
     )
+    ap.add_argument(
+        "--manifest",
+        default="",
+        help="persist the image directory walk here; later runs only re-list changed dirs",
+    )
+    ap.add_argument("--scan-workers", type=int, default=16, help="threads for the image directory walk")
     ap.add_argument("--prompt", default="prompts/bl_extraction_prompt.txt")
     ap.add_argument("--out", default="data/train.jsonl")
     ap.add_argument("--limit", type=int, default=0, help="limit number of documents (0 = all)")
@@ -77,6 +519,30 @@ def main() -> None:
         default="",
         help="write missing source filenames (no matching image) to this path",
     )
+    ap.add_argument(
+        "--stream",
+        action="store_true",
+        help="parse results.json incrementally instead of loading the whole file",
+    )
+    ap.add_argument(
+        "--group-mode",
+        choices=["memory", "sorted", "spill"],
+        default="memory",
+        help=(
+            "memory: group rows in a dict; sorted: rows are already grouped by Filename "
+            "(memory grows only with the number of Filenames); "
+            "spill: hash-partition rows to disk, then group per partition"
+        ),
+    )
+    ap.add_argument("--spill-dir", default="", help="temp directory for --group-mode spill")
+    ap.add_argument("--spill-partitions", type=int, default=64)
+    ap.add_argument(
+        "--incremental",
+        action="store_true",
+        help="re-emit only records whose rows or chosen image changed since the last build",
+    )
+    ap.add_argument("--state", default="", help="incremental build state (default: <out>.state.json)")
+    ap.add_argument("--change-summary", default="", help="write the incremental change summary (JSON) here")
     args = ap.parse_args()
 
     results_path = Path(args.results)
@@ -101,52 +567,34 @@ def main() -> None:
     # Index images by normalized stem for fast matching.
     cwd = Path.cwd().resolve()
 
-    images: list[Path] = []
-    for d in images_dirs:
-        for ext in ("*.jpg", "*.png", "*.jpeg", "*.JPG", "*.PNG", "*.JPEG"):
-            images.extend(d.rglob(ext))
+    images, manifest = scan_images(
+        images_dirs,
+        manifest_path=Path(args.manifest) if args.manifest else None,
+        workers=args.scan_workers,
+    )
+    if args.manifest:
+        print(
+            f"Image manifest: {len(images)} image(s), re-listed {manifest.rescanned_dirs} dir(s), "
+            f"reused {manifest.reused_dirs} -> {args.manifest}"
+        )
 
     norm_to_paths: dict[str, list[Path]] = defaultdict(list)
     for p in images:
         norm_to_paths[norm_key(p.stem)].append(p)
+    prefix_index = PrefixIndex(norm_to_paths)
 
     # Load tabular extraction results (one container per row).
-    rows = json.loads(results_path.read_text(encoding="utf-8"))
-
-    by_file: dict[str, dict[str, Any]] = {}
-
-    for r in rows:
-        fn = r.get("Filename")
-        if not fn:
-            continue
-
-        entry = by_file.get(fn)
-        if entry is None:
-            entry = {
-                "Filename": fn,
-                "consignee_name": r.get("consignee_name", ""),
-                "bl_number": r.get("bl_number", ""),
-                "port_of_loading": r.get("port_of_loading", ""),
-                "port_of_discharge": r.get("port_of_discharge", ""),
-                "vessel_name": r.get("vessel_name", ""),
-                "detention_free_days": r.get("detention_free_days"),
-                "demurrage_free_days": r.get("demurrage_free_days"),
-                "combined_free_days": r.get("combined_free_days"),
-                "container_details": [],
-                "_seen_containers": set(),
-            }
-            by_file[fn] = entry
-
-        cnum = (r.get("Container_Number") or "").strip()
-        if cnum and cnum not in entry["_seen_containers"]:
-            entry["_seen_containers"].add(cnum)
-            entry["container_details"].append(
-                {
-                    "container_number": cnum,
-                    "container_size": to_str_or_empty(r.get("Container_Size")),
-                    "container_type": to_str_or_empty(r.get("Container_Type")),
-                }
-            )
+    if args.stream:
+        rows: Iterable[dict[str, Any]] = iter_json_array(results_path)
+    else:
+        rows = json.loads(results_path.read_text(encoding="utf-8"))
+
+    if args.group_mode == "sorted":
+        entries = iter_sorted_groups(rows)
+    elif args.group_mode == "spill":
+        entries = iter_spilled_groups(rows, args.spill_dir or None, args.spill_partitions)
+    else:
+        entries = group_rows(rows)
 
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -154,8 +602,23 @@ def main() -> None:
     skipped = 0
     missing: list[str] = []
 
-    with out_path.open("w", encoding="utf-8") as out:
-        for fn, entry in by_file.items():
+    inc: IncrementalBuild | None = None
+    if args.incremental:
+        settings = {
+            "prompt_sha1": hashlib.sha1(prompt_text.encode("utf-8")).hexdigest(),
+            "cwd": str(cwd),
+            "skip_missing_images": bool(args.skip_missing_images),
+            "limit": args.limit,
+        }
+        state_path = Path(args.state) if args.state else out_path.with_name(out_path.name + ".state.json")
+        inc = IncrementalBuild(out_path, state_path, settings)
+        out_file = inc.tmp_path.open("wb")
+    else:
+        out_file = out_path.open("w", encoding="utf-8")
+
+    with out_file as out:
+        for entry in entries:
+            fn = entry["Filename"]
             if args.limit and written >= args.limit:
                 break
 
@@ -163,10 +626,7 @@ def main() -> None:
             nbase = norm_key(base)
 
             # Find candidate image paths whose normalized stem starts with the normalized base.
-            candidates: list[Path] = []
-            for k, vs in norm_to_paths.items():
-                if k.startswith(nbase):
-                    candidates.extend(vs)
+            candidates = prefix_index.candidates(nbase)
 
             if not candidates:
                 missing.append(fn)
@@ -174,69 +634,38 @@ def main() -> None:
                     skipped += 1
                     continue
                 image_rel = ""
+                image_sig: list[Any] = [image_rel]
             else:
                 chosen = prefer_image(candidates)
                 try:
                     image_rel = chosen.resolve().relative_to(cwd).as_posix()
                 except Exception:
                     image_rel = chosen.as_posix()
+                if inc is not None:
+                    image_sig = inc.image_sig(chosen, image_rel)
 
-            container_details = entry["container_details"]
-            total_expected = len(container_details) if container_details else None
-
-            assistant_obj = {
-                "consignee_name": to_str_or_empty(entry.get("consignee_name")),
-                "bl_number": to_str_or_empty(entry.get("bl_number")),
-                "port_of_loading": to_str_or_empty(entry.get("port_of_loading")),
-                "port_of_discharge": normalize_port_of_discharge(to_str_or_empty(entry.get("port_of_discharge"))),
-                "vessel_name": to_str_or_empty(entry.get("vessel_name")),
-                "detention_free_days": to_str_or_empty(entry.get("detention_free_days")),
-                "demurrage_free_days": to_str_or_empty(entry.get("demurrage_free_days")),
-                "combined_free_days": to_str_or_empty(entry.get("combined_free_days")),
-                "total_expected_containers": total_expected,
-                "container_details": container_details,
-            }
-
-            record = {
-                "id": norm_key(fn),
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": "Return ONLY valid JSON. No extra text.",
-                            }
-                        ],
-                    },
-                    {
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image",
-                                "image": image_rel if image_rel else "",
-                            },
-                            {"type": "text", "text": prompt_text},
-                        ],
-                    },
-                    {
-                        "role": "assistant",
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": json.dumps(assistant_obj, ensure_ascii=False),
-                            }
-                        ],
-                    },
-                ],
-                "meta": {
-                    "filename": fn,
-                    "image_rel": image_rel,
-                },
-            }
-
-            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if inc is not None:
+                inc.emit(out, fn, entry, image_rel, image_sig, prompt_text)
+            else:
+                record = build_record(fn, entry, image_rel, prompt_text)
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
             written += 1
+        if inc is not None:
+            inc.finish(out)
+
+    if inc is not None:
+        summary = inc.commit()
+        if summary["full_rebuild_reason"]:
+            print(f"Incremental: full rebuild ({summary['full_rebuild_reason']})")
+        print(
+            f"Incremental: added {len(summary['added'])}, changed {len(summary['changed_data'])} "
+            f"(+{len(summary['changed_image'])} image-only), removed {len(summary['removed'])}, "
+            f"unchanged {summary['unchanged']}"
+        )
+        if args.change_summary:
+            summary_path = Path(args.change_summary)
+            summary_path.parent.mkdir(parents=True, exist_ok=True)
+            summary_path.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
 
     print(f"Wrote {written} record(s) to {out_path}")
     if skipped:
@@ -1,9 +1,28 @@
+"""Dataset statistics for a chat-style (or simple {image,prompt,response}) JSONL.
+
+Basic counts need only the standard library. With `--model`, also profiles
+sequence lengths the way the training collator would build them: text tokens
+come from batched tokenization of the rendered chat template, image tokens
+from the image header alone (no pixel decode; `--autocrop` needs the pixels)
+pushed through the training collator's resize and the processor's patch/merge
+grid, so `--image-max-side`, `--resize-mode` and `--autocrop` count as in training.
+
+Example:
+  python scripts\\dataset_stats.py --in data\\train.jsonl --model Qwen/Qwen3-VL-8B-Instruct --max-lens 2048,4096,8192
+"""
+
 import argparse
 import json
+import sys
+import zipfile
 from collections import Counter
 from pathlib import Path
 from typing import Any
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "training"))
+
+PERCENTILES = (50, 90, 95, 99)
+
 
 def get_image_path(rec: dict[str, Any]) -> str:
     try:
@@ -18,9 +37,122 @@ def get_image_path(rec: dict[str, Any]) -> str:
     return ""
 
 
+def get_prompt_and_response(rec: dict[str, Any]) -> tuple[str, str, str]:
+    """(prompt, response, image) from a chat-style or simple record."""
+    if "messages" not in rec:
+        return str(rec.get("prompt") or ""), str(rec.get("response") or ""), str(rec.get("image") or "")
+    prompt = ""
+    for m in rec.get("messages") or []:
+        if isinstance(m, dict) and m.get("role") == "user":
+            for item in m.get("content") or []:
+                if isinstance(item, dict) and item.get("type") == "text" and not prompt:
+                    prompt = str(item.get("text") or "")
+    try:
+        response = str(rec["messages"][-1]["content"][0]["text"] or "")
+    except Exception:
+        response = ""
+    return prompt, response, get_image_path(rec)
+
+
+def percentile(sorted_vals: list[int], q: float) -> int:
+    if not sorted_vals:
+        return 0
+    i = min(len(sorted_vals) - 1, max(0, int(round(q / 100.0 * (len(sorted_vals) - 1)))))
+    return sorted_vals[i]
+
+
+def profile_tokens(
+    in_path: Path,
+    model: str,
+    image_max_side: int,
+    batch_size: int,
+    resize_mode: str = "long-side",
+    decoder: str = "pil",
+    autocrop: bool = False,
+) -> tuple[list[int], list[int], int]:
+    """Return (text_tokens, image_tokens) per record with a readable image, plus the unreadable count.
+
+    Image tokens come from the training collator's own resize and patch grid (header only, unless autocrop
+    needs the pixels), so they follow --resize-mode and --autocrop exactly as training does.
+    """
+    from transformers import AutoProcessor
+
+    from train_qwen3vl_qlora import Collator
+
+    processor = AutoProcessor.from_pretrained(model, trust_remote_code=True)
+    collator = Collator(
+        processor, image_max_side, max_length=0, decoder=decoder, resize_mode=resize_mode, autocrop=autocrop
+    )
+    tokenizer = processor.tokenizer
+    image_token = getattr(processor, "image_token", "<|image_pad|>")
+    image_token_id = tokenizer.convert_tokens_to_ids(image_token)
+
+    text_lens: list[int] = []
+    image_lens: list[int] = []
+    unreadable = 0
+    texts: list[str] = []
+
+    def flush() -> None:
+        enc = tokenizer(texts, add_special_tokens=False)["input_ids"]
+        # the template holds one image placeholder; the processor expands it to the image tokens
+        text_lens.extend(len(ids) - ids.count(image_token_id) for ids in enc)
+        texts.clear()
+
+    with in_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            prompt, response, image = get_prompt_and_response(json.loads(line))
+            try:
+                n_img = collator.image_tokens(image)
+            except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+                unreadable += 1
+                continue
+            image_lens.append(n_img)
+            texts.append(collator.render_text(prompt, response))
+            if len(texts) >= batch_size:
+                flush()
+    if texts:
+        flush()
+    return text_lens, image_lens, unreadable
+
+
+def print_distribution(name: str, vals: list[int]) -> None:
+    s = sorted(vals)
+    pct = " ".join(f"p{q}={percentile(s, q)}" for q in PERCENTILES)
+    print(f"{name}: min={s[0]} {pct} max={s[-1]} mean={sum(s) / len(s):.1f}")
+
+
+def print_histogram(vals: list[int], bins: int, width: int = 40) -> None:
+    lo, hi = min(vals), max(vals)
+    step = max(1, -(-(hi - lo + 1) // bins))
+    counts = Counter((v - lo) // step for v in vals)
+    peak = max(counts.values())
+    for b in range(-(-(hi - lo + 1) // step)):
+        c = counts.get(b, 0)
+        start = lo + b * step
+        print(f"  [{start:>6}, {start + step:>6}) {c:>7} {'#' * round(width * c / peak)}")
+
+
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--in", dest="in_path", default="data/train.jsonl")
+    ap.add_argument(
+        "--model",
+        default="",
+        help="processor/tokenizer to profile token lengths with (e.g. Qwen/Qwen3-VL-8B-Instruct); '' skips it",
+    )
+    ap.add_argument("--image-max-side", type=int, default=1536, help="same as the trainer's --image-max-side")
+    ap.add_argument(
+        "--resize-mode", choices=["long-side", "grid"], default="long-side", help="same as the trainer's --resize-mode"
+    )
+    ap.add_argument("--decoder", default="pil", help="same as the trainer's --decoder (matters with --autocrop)")
+    ap.add_argument("--autocrop", action="store_true", help="same as the trainer's --autocrop")
+    ap.add_argument(
+        "--max-lens", default="2048,4096,6144,8192", help="comma-separated candidate --max-len values"
+    )
+    ap.add_argument("--batch-size", type=int, default=256, help="records per tokenizer call")
+    ap.add_argument("--bins", type=int, default=12, help="histogram bins for total sequence length")
     args = ap.parse_args()
 
     in_path = Path(args.in_path)
@@ -78,6 +210,40 @@ def main() -> None:
             f"max={containers_per_doc[-1]}"
         )
 
+    if not args.model:
+        return
+
+    try:
+        max_lens = sorted({int(x) for x in args.max_lens.split(",") if x.strip()})
+    except ValueError:
+        raise SystemExit(f"--max-lens must be comma-separated integers: {args.max_lens!r}")
+
+    text_lens, image_lens, unreadable = profile_tokens(
+        in_path,
+        args.model,
+        args.image_max_side,
+        max(1, args.batch_size),
+        resize_mode=args.resize_mode,
+        decoder=args.decoder,
+        autocrop=args.autocrop,
+    )
+    if unreadable:
+        print(f"records without a readable image (skipped for token stats): {unreadable}")
+    if not text_lens:
+        return
+    totals = [t + i for t, i in zip(text_lens, image_lens)]
+
+    print(f"token lengths (image_max_side={args.image_max_side}):")
+    print_distribution("  text tokens", text_lens)
+    print_distribution("  image tokens", image_lens)
+    print_distribution("  total tokens", totals)
+    print("total tokens histogram:")
+    print_histogram(totals, max(1, args.bins))
+    print("truncated at --max-len:")
+    for L in max_lens:
+        over = sum(1 for t in totals if t > L)
+        print(f"  {L:>6}: {over}/{len(totals)} ({100.0 * over / len(totals):.2f}%)")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,382 @@
+"""Find near-duplicate scans in a JSONL dataset with perceptual hashes, then group or drop them.
+
+Each referenced image (file or zip:// member) gets a 64-bit dHash (computed in a
+process pool, cached by path/size/mtime). Near-duplicates are found with a
+multi-index hash: the code is split into chunks and, by the pigeonhole principle,
+any two codes within Hamming distance t agree within t // chunks bits on at least
+one chunk, so only a few bucket probes per image are needed instead of comparing
+all pairs.
+
+Scans from the same B/L template can hash within a few bits of each other, so
+two records are only linked when their assistant JSON also agrees on
+`--match-key` (default `bl_number`), and clusters are chained through such
+agreeing pairs only.
+
+Example:
+  python scripts\\dedup_jsonl.py --in data\\train.jsonl --out data\\train.dedup.jsonl --action drop
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "training"))
+
+from zip_images import is_zip_uri, open_zip_image, parse_zip_uri, source_stat  # noqa: E402
+
+HASH_SIZE = 8  # 8x8 gradient bits -> 64-bit code
+
+
+def get_image_path(rec: dict[str, Any]) -> str:
+    msgs = rec.get("messages")
+    if not isinstance(msgs, list):
+        return ""
+    for m in msgs:
+        if not isinstance(m, dict) or m.get("role") != "user":
+            continue
+        content = m.get("content")
+        if not isinstance(content, list):
+            continue
+        for item in content:
+            if isinstance(item, dict) and item.get("type") == "image":
+                return str(item.get("image") or "")
+    return ""
+
+
+def get_assistant_obj(rec: dict[str, Any]) -> Any:
+    try:
+        return json.loads(rec["messages"][-1]["content"][0]["text"])
+    except Exception:
+        return None
+
+
+def match_value(obj: Any, key: str) -> str | None:
+    """Normalized `key` of an assistant payload; None when missing or empty (never linked)."""
+    if not key:
+        return ""
+    v = obj.get(key) if isinstance(obj, dict) else None
+    v = " ".join(str(v).split()).upper() if v is not None else ""
+    return v or None
+
+
+def completeness(obj: Any) -> int:
+    """How much an assistant payload says: non-empty fields plus container entries."""
+    if not isinstance(obj, dict):
+        return -1
+    score = sum(1 for v in obj.values() if v not in ("", None, [], {}))
+    cd = obj.get("container_details")
+    if isinstance(cd, list):
+        score += len(cd)
+    return score
+
+
+def dhash(path: str) -> int | None:
+    """64-bit difference hash of a grayscale thumbnail of a file or zip:// member (runs in a worker process)."""
+    from PIL import Image
+
+    try:
+        with open_zip_image(path) if is_zip_uri(path) else open(path, "rb") as f, Image.open(f) as img:
+            # JPEG: let the decoder downscale in the DCT domain; no-op for other formats
+            img.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))
+            small = img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS)
+            px = small.tobytes()
+    except Exception:
+        return None
+    code = 0
+    w = HASH_SIZE + 1
+    for y in range(HASH_SIZE):
+        row = px[y * w : (y + 1) * w]
+        for x in range(HASH_SIZE):
+            code = (code << 1) | (row[x] > row[x + 1])
+    return code
+
+
+class MultiIndexHash:
+    """Hamming-radius search over 64-bit codes using `chunks` exact-match tables."""
+
+    def __init__(self, chunks: int = 4, bits: int = 64):
+        if bits % chunks:
+            raise ValueError("bits must be divisible by chunks")
+        self.chunks = chunks
+        self.chunk_bits = bits // chunks
+        self.mask = (1 << self.chunk_bits) - 1
+        self.tables: list[dict[int, list[int]]] = [defaultdict(list) for _ in range(chunks)]
+        self.codes: list[int] = []
+        self._flips: dict[int, list[int]] = {}
+
+    def _flip_masks(self, radius: int) -> list[int]:
+        masks = self._flips.get(radius)
+        if masks is None:
+            masks = [0]
+            for r in range(1, radius + 1):
+                for pos in itertools.combinations(range(self.chunk_bits), r):
+                    masks.append(sum(1 << p for p in pos))
+            self._flips[radius] = masks
+        return masks
+
+    def _split(self, code: int) -> list[int]:
+        return [(code >> (i * self.chunk_bits)) & self.mask for i in range(self.chunks)]
+
+    def add(self, code: int) -> int:
+        idx = len(self.codes)
+        self.codes.append(code)
+        for table, part in zip(self.tables, self._split(code)):
+            table[part].append(idx)
+        return idx
+
+    def query(self, code: int, max_dist: int) -> list[int]:
+        flips = self._flip_masks(max_dist // self.chunks)
+        seen: set[int] = set()
+        for table, part in zip(self.tables, self._split(code)):
+            for f in flips:
+                bucket = table.get(part ^ f)
+                if bucket:
+                    seen.update(bucket)
+        return [i for i in seen if (self.codes[i] ^ code).bit_count() <= max_dist]
+
+
+class UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def hash_images(paths: list[str], cache_path: Path | None, workers: int) -> dict[str, int | None]:
+    cache: dict[str, list[Any]] = {}
+    if cache_path is not None and cache_path.exists():
+        try:
+            cache = json.loads(cache_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            cache = {}
+
+    out: dict[str, int | None] = {}
+    todo: list[str] = []
+    for p in paths:
+        try:
+            sig = source_stat(p)
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+            out[p] = None
+            continue
+        hit = cache.get(p)
+        if hit is not None and hit[:2] == list(sig):
+            out[p] = hit[2]
+        else:
+            todo.append(p)
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+            chunk = max(1, len(todo) // (max(1, workers) * 8))
+            for p, code in zip(todo, pool.map(dhash, todo, chunksize=chunk)):
+                out[p] = code
+                try:
+                    cache[p] = [*source_stat(p), code]
+                except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+                    pass
+
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_name(cache_path.name + ".tmp")
+        tmp.write_text(json.dumps(cache, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, cache_path)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--in", dest="in_path", default="data/train.jsonl")
+    ap.add_argument("--out", dest="out_path", required=True)
+    ap.add_argument(
+        "--action",
+        choices=["drop", "group"],
+        default="group",
+        help=(
+            "group: keep all and set meta.dup_group for split_jsonl.py --key group; "
+            "drop: keep one record per near-duplicate cluster (the most complete assistant JSON, then the first seen)"
+        ),
+    )
+    ap.add_argument(
+        "--match-key",
+        default="bl_number",
+        help="assistant JSON field near-duplicates must also agree on; '' links on the image alone (group only)",
+    )
+    ap.add_argument("--max-dist", type=int, default=6, help="Hamming distance (of 64 bits) for near-duplicates")
+    ap.add_argument("--chunks", type=int, choices=[4, 8], default=4, help="multi-index hash tables (16- or 8-bit)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--hash-cache", default="docs/dhash_cache.json", help="'' disables the cache")
+    ap.add_argument("--report", default="docs/dedup_report.json")
+    args = ap.parse_args()
+
+    in_path = Path(args.in_path)
+    out_path = Path(args.out_path)
+    if not in_path.exists():
+        raise SystemExit(f"Input not found: {in_path}")
+
+    if args.action == "drop" and not args.match_key:
+        raise SystemExit("--action drop needs --match-key: image similarity alone also matches different documents")
+
+    cwd = Path.cwd().resolve()
+
+    # Pass 1: image path and match value per record (records themselves are re-read in pass 2).
+    rec_paths: list[str] = []
+    rec_values: list[str | None] = []
+    ids: list[str] = []
+    with in_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            ids.append(str(rec.get("id") or ""))
+            rec_values.append(match_value(get_assistant_obj(rec), args.match_key))
+            img = get_image_path(rec)
+            if not img:
+                rec_paths.append("")
+            elif is_zip_uri(img):
+                try:
+                    archive, member = parse_zip_uri(img)
+                except ValueError:
+                    rec_paths.append("")
+                    continue
+                # archive resolved against CWD, so cache keys do not depend on where the script runs
+                rec_paths.append(f"zip://{archive}#{member}")
+            else:
+                p = Path(img)
+                if not p.is_absolute():
+                    p = (cwd / p).resolve()
+                rec_paths.append(str(p))
+
+    unique_paths = sorted({p for p in rec_paths if p})
+    codes = hash_images(
+        unique_paths, Path(args.hash_cache) if args.hash_cache else None, args.workers
+    )
+
+    # Index distinct codes only; identical codes collapse before any Hamming search.
+    # A node is one (code, match value) pair, so links never cross match values.
+    code_nodes: dict[int, dict[str, int]] = defaultdict(dict)
+    node_members: list[list[int]] = []
+    unhashed = 0
+    unmatched = 0
+    for i, p in enumerate(rec_paths):
+        code = codes.get(p) if p else None
+        if code is None:
+            unhashed += 1
+            continue
+        value = rec_values[i]
+        if value is None:
+            unmatched += 1
+            continue
+        node = code_nodes[code].get(value)
+        if node is None:
+            node = code_nodes[code][value] = len(node_members)
+            node_members.append([])
+        node_members[node].append(i)
+
+    distinct = list(code_nodes)
+    index = MultiIndexHash(chunks=args.chunks)
+    uf = UnionFind(len(node_members))
+    for code in distinct:
+        nodes = code_nodes[code]
+        for cj in index.query(code, args.max_dist):
+            other = code_nodes[distinct[cj]]
+            for value, node in nodes.items():
+                if value in other:
+                    uf.union(node, other[value])
+        index.add(code)
+
+    clusters: dict[int, list[int]] = defaultdict(list)
+    for node, m in enumerate(node_members):
+        clusters[uf.find(node)].extend(m)
+    dup_clusters = [sorted(m) for m in clusters.values() if len(m) > 1]
+    dup_clusters.sort(key=lambda m: m[0])
+
+    # Pass 2: choose representatives (assistant JSON completeness breaks ties) and write.
+    members = {i for m in dup_clusters for i in m}
+    scores: dict[int, int] = {}
+    with in_path.open("r", encoding="utf-8") as f:
+        i = -1
+        for line in f:
+            if not line.strip():
+                continue
+            i += 1
+            if i in members:
+                scores[i] = completeness(get_assistant_obj(json.loads(line)))
+
+    group_of: dict[int, str] = {}
+    drop: set[int] = set()
+    report_clusters: list[dict[str, Any]] = []
+    for m in dup_clusters:
+        keep = max(m, key=lambda j: (scores.get(j, -1), -j))
+        for j in m:
+            group_of[j] = ids[keep]
+            if j != keep:
+                drop.add(j)
+        report_clusters.append({"keep": ids[keep], "members": [ids[j] for j in m]})
+
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+    with in_path.open("r", encoding="utf-8") as f, out_path.open("w", encoding="utf-8") as out:
+        i = -1
+        for line in f:
+            if not line.strip():
+                continue
+            i += 1
+            if args.action == "drop":
+                if i in drop:
+                    continue
+                out.write(line)
+            elif i in group_of:
+                rec = json.loads(line)
+                meta = rec.get("meta") if isinstance(rec.get("meta"), dict) else {}
+                rec["meta"] = {**meta, "dup_group": group_of[i]}
+                out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            else:
+                out.write(line)
+            written += 1
+
+    report_path = Path(args.report)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(
+        json.dumps(
+            {
+                "records": len(ids),
+                "unhashed": unhashed,
+                "unmatched": unmatched,
+                "max_dist": args.max_dist,
+                "match_key": args.match_key,
+                "clusters": report_clusters,
+            },
+            ensure_ascii=False,
+            indent=2,
+        ),
+        encoding="utf-8",
+    )
+
+    print(
+        f"records: {len(ids)}  hashed images: {len(unique_paths)}  unhashed records: {unhashed}  "
+        f"without {args.match_key or 'match key'}: {unmatched}"
+    )
+    print(f"near-duplicate clusters: {len(dup_clusters)} covering {len(members)} record(s)")
+    if args.action == "drop":
+        print(f"dropped: {len(drop)}")
+    print(f"Wrote {written} record(s) to {out_path}")
+    print(f"report -> {report_path}")
+
+
+if __name__ == "__main__":
+    main()
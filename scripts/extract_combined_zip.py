@@ -1,7 +1,91 @@
 import argparse
+import os
+import shutil
+import threading
 import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+CHUNK_SIZE = 1 << 20
+BATCH_SIZE = 256
+
+
+class ZipHandles:
+    """One ZipFile handle per thread for one archive (ZipFile objects must not be shared
+    across threads); `close()` closes all of them once the workers are done."""
+
+    def __init__(self, zip_path: Path):
+        self.zip_path = zip_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all: list[zipfile.ZipFile] = []
+
+    def get(self) -> zipfile.ZipFile:
+        z = getattr(self._local, "zip", None)
+        if z is None:
+            z = self._local.zip = zipfile.ZipFile(self.zip_path)
+            with self._lock:
+                self._all.append(z)
+        return z
+
+    def close(self) -> None:
+        with self._lock:
+            handles, self._all = self._all, []
+        for z in handles:
+            z.close()
+
+    def __enter__(self) -> "ZipHandles":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def file_crc32(path: Path, chunk_size: int = CHUNK_SIZE) -> int:
+    crc = 0
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return crc
+            crc = zlib.crc32(chunk, crc)
+
+
+def matches_entry(target: Path, info: zipfile.ZipInfo) -> bool:
+    """True when `target` already holds exactly this archive member (size, then CRC32)."""
+    try:
+        if target.stat().st_size != info.file_size:
+            return False
+    except OSError:
+        return False
+    return file_crc32(target) == info.CRC
+
+
+def extract_batch(
+    handles: ZipHandles,
+    out_dir: Path,
+    infos: list[zipfile.ZipInfo],
+    overwrite: bool,
+    verify_crc: bool,
+) -> tuple[int, int]:
+    z = handles.get()
+    extracted = 0
+    skipped = 0
+    for info in infos:
+        target = out_dir / info.filename
+        target.parent.mkdir(parents=True, exist_ok=True)
+
+        if not overwrite and target.exists():
+            if not verify_crc or matches_entry(target, info):
+                skipped += 1
+                continue
+
+        with z.open(info) as src, target.open("wb") as dst:
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+        extracted += 1
+    return extracted, skipped
+
 
 def main() -> None:
     ap = argparse.ArgumentParser()
@@ -21,6 +105,17 @@ def main() -> None:
         ),
     )
     ap.add_argument("--overwrite", action="store_true")
+    ap.add_argument(
+        "--verify-crc",
+        action="store_true",
+        help="skip an existing file only if its size and CRC32 match the archive entry",
+    )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=min(8, os.cpu_count() or 1),
+        help="parallel extraction threads (each opens its own ZipFile handle)",
+    )
     args = ap.parse_args()
 
     zip_paths = [Path(p) for p in (args.zip_paths or [])]
@@ -37,23 +132,22 @@ def main() -> None:
         out_dir = Path(args.out_dir) if args.out_dir else (Path("data/raw") / zip_path.stem)
         out_dir.mkdir(parents=True, exist_ok=True)
 
-        extracted = 0
-        skipped = 0
         with zipfile.ZipFile(zip_path) as z:
-            for info in z.infolist():
-                if info.is_dir():
-                    continue
-
-                target = out_dir / info.filename
-                target.parent.mkdir(parents=True, exist_ok=True)
+            infos = [info for info in z.infolist() if not info.is_dir()]
+        batches = [infos[i : i + BATCH_SIZE] for i in range(0, len(infos), BATCH_SIZE)]
 
-                if target.exists() and not args.overwrite:
-                    skipped += 1
-                    continue
-
-                with z.open(info) as src, target.open("wb") as dst:
-                    dst.write(src.read())
-                extracted += 1
+        extracted = 0
+        skipped = 0
+        # handles closes after the pool has joined its threads
+        with ZipHandles(zip_path) as handles, ThreadPoolExecutor(max_workers=max(1, args.workers)) as pool:
+            futures = [
+                pool.submit(extract_batch, handles, out_dir, batch, args.overwrite, args.verify_crc)
+                for batch in batches
+            ]
+            for fut in futures:
+                e, sk = fut.result()
+                extracted += e
+                skipped += sk
 
         total_extracted += extracted
         total_skipped += skipped
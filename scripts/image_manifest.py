@@ -0,0 +1,146 @@
+"""Parallel image directory walk with an optional persistent on-disk manifest.
+
+Used by `build_jsonl_from_results.py` and `verify_image_paths.py`.
+
+The manifest stores, per directory, its mtime plus the image files it holds
+(name -> [size, mtime_ns]) and its subdirectories. On a later run a directory
+whose mtime is unchanged is neither listed nor stat'ed again; listing and
+stat calls are the expensive part on NFS-mounted image stores. Adding,
+removing or renaming a file changes its directory's mtime, so the file sets
+are current. Rewriting a file in place (as `extract_combined_zip.py` does)
+does not, so the stored sizes and mtimes are as of the last listing; callers
+that need fresh values stat the files they use (`--incremental` does).
+"""
+
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any
+
+IMAGE_EXTS = frozenset({".jpg", ".jpeg", ".png"})
+MANIFEST_VERSION = 1
+
+
+def _scan_dir(
+    root: Path, rel: str, cached: dict[str, Any] | None, exts: frozenset[str]
+) -> tuple[str, dict[str, Any], bool]:
+    """List one directory, reusing the listing in `cached` when the directory mtime is unchanged.
+
+    Returns (rel, dir_entry, rescanned).
+    """
+    d = root / rel if rel else root
+    st = d.stat()
+    if cached is not None and cached.get("mtime_ns") == st.st_mtime_ns:
+        return rel, cached, False
+
+    files: dict[str, list[int]] = {}
+    dirs: list[str] = []
+    with os.scandir(d) as it:
+        for entry in it:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.name)
+                elif os.path.splitext(entry.name)[1].lower() in exts and entry.is_file():
+                    est = entry.stat()
+                    files[entry.name] = [est.st_size, est.st_mtime_ns]
+            except OSError:
+                # vanished or unreadable between listing and stat
+                continue
+    dirs.sort()
+    return rel, {"mtime_ns": st.st_mtime_ns, "files": files, "dirs": dirs}, True
+
+
+class ImageManifest:
+    """Image files under one or more root directories, keyed by resolved root path."""
+
+    def __init__(self, roots: dict[str, dict[str, Any]] | None = None):
+        self.roots: dict[str, dict[str, Any]] = roots or {}
+        self.rescanned_dirs = 0
+        self.reused_dirs = 0
+
+    @classmethod
+    def load(cls, path: Path | None) -> "ImageManifest":
+        if path is None or not path.exists():
+            return cls()
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls()
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return cls()
+        return cls(data.get("roots") or {})
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(
+            json.dumps({"version": MANIFEST_VERSION, "roots": self.roots}, ensure_ascii=False),
+            encoding="utf-8",
+        )
+        os.replace(tmp, path)
+
+    def refresh(self, root: Path, workers: int = 16, exts: frozenset[str] = IMAGE_EXTS) -> None:
+        """Walk `root` in parallel, re-listing only directories whose mtime changed."""
+        key = str(root.resolve())
+        old_dirs: dict[str, Any] = (self.roots.get(key) or {}).get("dirs") or {}
+        new_dirs: dict[str, Any] = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            pending = {pool.submit(_scan_dir, root, "", old_dirs.get(""), exts)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    try:
+                        rel, entry, rescanned = fut.result()
+                    except OSError:
+                        continue
+                    new_dirs[rel] = entry
+                    if rescanned:
+                        self.rescanned_dirs += 1
+                    else:
+                        self.reused_dirs += 1
+                    for name in entry["dirs"]:
+                        child = f"{rel}/{name}" if rel else name
+                        pending.add(pool.submit(_scan_dir, root, child, old_dirs.get(child), exts))
+
+        self.roots[key] = {"dirs": new_dirs}
+
+    def files(self, root: Path) -> dict[Path, tuple[int, int]]:
+        """Return {root / relpath: (size, mtime_ns) at its last listing} for a refreshed root, in sorted path order."""
+        dirs = (self.roots.get(str(root.resolve())) or {}).get("dirs") or {}
+        out: dict[Path, tuple[int, int]] = {}
+        for rel in sorted(dirs):
+            base = root / rel if rel else root
+            for name in sorted(dirs[rel]["files"]):
+                size, mtime_ns = dirs[rel]["files"][name]
+                out[base / name] = (size, mtime_ns)
+        return out
+
+    def resolved_paths(self) -> set[str]:
+        """All files in the manifest as resolved absolute path strings (for membership checks)."""
+        out: set[str] = set()
+        for key, data in self.roots.items():
+            for rel, entry in (data.get("dirs") or {}).items():
+                # manifest paths are "/"-separated; build native ones so they match resolved Path strings on Windows
+                base = Path(key, *rel.split("/")) if rel else Path(key)
+                for name in entry["files"]:
+                    out.add(str(base / name))
+        return out
+
+
+def scan_images(
+    roots: list[Path], manifest_path: Path | None = None, workers: int = 16
+) -> tuple[list[Path], ImageManifest]:
+    """Return image paths under `roots` (root-relative, like `Path.rglob`) and the manifest.
+
+    When `manifest_path` is set the manifest is loaded first and saved afterwards.
+    """
+    manifest = ImageManifest.load(manifest_path)
+    images: list[Path] = []
+    for root in roots:
+        manifest.refresh(root, workers=workers)
+        images.extend(manifest.files(root))
+    if manifest_path is not None:
+        manifest.save(manifest_path)
+    return images, manifest
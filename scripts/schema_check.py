@@ -0,0 +1,291 @@
+"""Compile a JSON Schema into a specialized Python check function.
+
+The schema is translated once into straight-line Python source (isinstance tests,
+key lookups and loops, with `$ref`s inlined) and exec'd, so validating a record
+costs about as much as hand-written checks. Error paths are only formatted when
+a check fails.
+
+Supported keywords (enough for the schemas in `schemas/`): type, enum, const,
+minLength, maxLength, pattern, minItems, maxItems, items, required, properties,
+additionalProperties, allOf, if/then/else and local `$ref`s (#/$defs/...,
+#/definitions/...). Unknown keywords raise at compile time instead of being
+silently ignored.
+"""
+
+import ast
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable
+
+_TYPE_TESTS = {
+    "object": "isinstance({v}, dict)",
+    "array": "isinstance({v}, list)",
+    "string": "isinstance({v}, str)",
+    "integer": "(isinstance({v}, int) and not isinstance({v}, bool))",
+    "number": "(isinstance({v}, (int, float)) and not isinstance({v}, bool))",
+    "boolean": "isinstance({v}, bool)",
+    "null": "{v} is None",
+}
+_ANNOTATIONS = {
+    "$schema", "$id", "$comment", "$defs", "definitions",
+    "title", "description", "default", "examples",
+}
+_STRING_KW = ("minLength", "maxLength", "pattern")
+_ARRAY_KW = ("minItems", "maxItems", "items")
+_OBJECT_KW = ("required", "properties", "additionalProperties")
+_SUPPORTED = {
+    "type", "enum", "const", "allOf", "if", "then", "else", "$ref",
+    *_STRING_KW, *_ARRAY_KW, *_OBJECT_KW,
+}
+
+
+def _json_type(v: Any) -> str:
+    if v is None:
+        return "null"
+    if isinstance(v, bool):
+        return "boolean"
+    if isinstance(v, int):
+        return "integer"
+    if isinstance(v, float):
+        return "number"
+    if isinstance(v, str):
+        return "string"
+    if isinstance(v, list):
+        return "array"
+    if isinstance(v, dict):
+        return "object"
+    return type(v).__name__
+
+
+class _Compiler:
+    def __init__(self, root: dict[str, Any]):
+        self.root = root
+        self.lines: list[str] = []
+        self.ns: dict[str, Any] = {"_json_type": _json_type}
+        self.n = 0
+        self.ref_stack: list[str] = []
+        # if/then/else predicates are flags, not error lists: only failure matters
+        self.predicates: set[str] = set()
+
+    def var(self, prefix: str) -> str:
+        self.n += 1
+        return f"{prefix}{self.n}"
+
+    def const(self, value: Any) -> str:
+        name = self.var("_k")
+        self.ns[name] = value
+        return name
+
+    def emit(self, ind: int, line: str) -> None:
+        self.lines.append("    " * ind + line)
+
+    def block(self, ind: int, headers: list[str], body: Callable[[int], None]) -> None:
+        """Emit `headers` (each nested one level deeper) and the body; drop them if the body is empty."""
+        start = len(self.lines)
+        for i, h in enumerate(headers):
+            self.emit(ind + i, h)
+        mark = len(self.lines)
+        body(ind + len(headers))
+        if len(self.lines) == mark:
+            del self.lines[start:]
+
+    @staticmethod
+    def path_expr(path: list[str]) -> str:
+        # literal parts are stored quoted (and merged); variable parts are bare names
+        parts: list[str] = []
+        for p in path:
+            if p.startswith("'") and parts and parts[-1].startswith("'"):
+                parts[-1] = repr(ast.literal_eval(parts[-1]) + ast.literal_eval(p))
+            else:
+                parts.append(p)
+        return " + ".join(p if p.startswith("'") else f"str({p})" for p in parts)
+
+    def error(self, ind: int, path: list[str], errs: str, msg_expr: str) -> None:
+        if errs in self.predicates:
+            self.emit(ind, f"{errs} = True")
+            return
+        where = self.path_expr([*path, repr(": ")])
+        self.emit(ind, f"{errs}.append({where} + {msg_expr})")
+
+    def resolve(self, ref: str) -> dict[str, Any]:
+        if not ref.startswith("#/"):
+            raise ValueError(f"Only local $ref is supported: {ref!r}")
+        node: Any = self.root
+        for part in ref[2:].split("/"):
+            node = node[part.replace("~1", "/").replace("~0", "~")]
+        return node
+
+    def node(
+        self, schema: Any, v: str, path: list[str], errs: str, ind: int, known: str | None = None
+    ) -> None:
+        """Emit checks of `schema` against variable `v`; `known` is a JSON type already established."""
+        if schema is True or schema == {}:
+            return
+        if schema is False:
+            self.error(ind, path, errs, repr("not allowed"))
+            return
+        unknown = set(schema) - _SUPPORTED - _ANNOTATIONS
+        if unknown:
+            raise ValueError(f"Unsupported JSON Schema keyword(s): {sorted(unknown)}")
+
+        if "$ref" in schema:
+            ref = schema["$ref"]
+            if ref in self.ref_stack:
+                raise ValueError(f"Recursive $ref is not supported: {ref!r}")
+            self.ref_stack.append(ref)
+            self.node(self.resolve(ref), v, path, errs, ind, known)
+            self.ref_stack.pop()
+
+        types = schema.get("type")
+        if isinstance(types, str):
+            types = [types]
+        if types and known in types:
+            self.body(schema, [known], v, path, errs, ind)
+        elif types:
+            test = " or ".join(_TYPE_TESTS[t].format(v=v) for t in types)
+            self.emit(ind, f"if not ({test}):")
+            self.error(
+                ind + 1, path, errs, f"'expected {'/'.join(types)}, got ' + _json_type({v})"
+            )
+            self.block(ind, ["else:"], lambda i: self.body(schema, types, v, path, errs, i))
+        else:
+            self.body(schema, [known] if known else None, v, path, errs, ind)
+
+    def body(
+        self, schema: dict[str, Any], types: list[str] | None, v: str, path: list[str], errs: str, ind: int
+    ) -> None:
+        if "const" in schema:
+            c = self.const(schema["const"])
+            self.emit(ind, f"if {v} != {c}:")
+            self.error(ind + 1, path, errs, f"'must be ' + repr({c})")
+        if "enum" in schema:
+            c = self.const(tuple(schema["enum"]))
+            self.emit(ind, f"if {v} not in {c}:")
+            self.error(ind + 1, path, errs, f"repr({v})[:80] + ' is not one of ' + repr(list({c}))")
+
+        def guarded(kws: tuple[str, ...], jtype: str, py: str, fn: Callable[[int], None]) -> None:
+            if not any(k in schema for k in kws):
+                return
+            if types == [jtype]:
+                fn(ind)
+            else:
+                # keyword only applies to values of its type
+                self.block(ind, [f"if isinstance({v}, {py}):"], fn)
+
+        guarded(_STRING_KW, "string", "str", lambda i: self.string_kw(schema, v, path, errs, i))
+        guarded(_ARRAY_KW, "array", "list", lambda i: self.array_kw(schema, v, path, errs, i))
+        guarded(_OBJECT_KW, "object", "dict", lambda i: self.object_kw(schema, v, path, errs, i))
+
+        known = types[0] if types and len(types) == 1 else None
+        for sub in schema.get("allOf", []):
+            self.node(sub, v, path, errs, ind, known)
+
+        if "if" in schema:
+            t = self.var("_t")
+            self.predicates.add(t)
+            self.emit(ind, f"{t} = False")
+            self.node(schema["if"], v, path, t, ind, known)
+            if "then" in schema:
+                self.block(
+                    ind, [f"if not {t}:"], lambda i: self.node(schema["then"], v, path, errs, i, known)
+                )
+            if "else" in schema:
+                self.block(ind, [f"if {t}:"], lambda i: self.node(schema["else"], v, path, errs, i, known))
+
+    def string_kw(self, schema: dict[str, Any], v: str, path: list[str], errs: str, ind: int) -> None:
+        if "minLength" in schema:
+            n = int(schema["minLength"])
+            self.emit(ind, f"if len({v}) < {n}:")
+            self.error(ind + 1, path, errs, repr(f"must have at least {n} character(s)"))
+        if "maxLength" in schema:
+            n = int(schema["maxLength"])
+            self.emit(ind, f"if len({v}) > {n}:")
+            self.error(ind + 1, path, errs, repr(f"must have at most {n} character(s)"))
+        if "pattern" in schema:
+            rx = self.const(re.compile(schema["pattern"]))
+            self.emit(ind, f"if {rx}.search({v}) is None:")
+            self.error(ind + 1, path, errs, repr(f"must match /{schema['pattern']}/"))
+
+    def array_kw(self, schema: dict[str, Any], v: str, path: list[str], errs: str, ind: int) -> None:
+        if "minItems" in schema:
+            n = int(schema["minItems"])
+            self.emit(ind, f"if len({v}) < {n}:")
+            self.error(ind + 1, path, errs, repr(f"must have at least {n} item(s)"))
+        if "maxItems" in schema:
+            n = int(schema["maxItems"])
+            self.emit(ind, f"if len({v}) > {n}:")
+            self.error(ind + 1, path, errs, repr(f"must have at most {n} item(s)"))
+        if "items" in schema:
+            i, x = self.var("_i"), self.var("_x")
+            self.block(
+                ind,
+                [f"for {i}, {x} in enumerate({v}):"],
+                lambda j: self.node(schema["items"], x, [*path, "'['", i, "']'"], errs, j),
+            )
+
+    def object_kw(self, schema: dict[str, Any], v: str, path: list[str], errs: str, ind: int) -> None:
+        for key in schema.get("required", []):
+            self.emit(ind, f"if {key!r} not in {v}:")
+            self.error(ind + 1, path, errs, repr(f"missing required key {key!r}"))
+        props = schema.get("properties", {})
+        for key, sub in props.items():
+            x = self.var("_x")
+            self.block(
+                ind,
+                [f"if {key!r} in {v}:"],
+                lambda j, key=key, sub=sub, x=x: self.prop(sub, v, key, x, path, errs, j),
+            )
+        extra = schema.get("additionalProperties", True)
+        if extra is not True and extra != {}:
+            allowed = self.const(frozenset(props))
+            k = self.var("_p")
+            if extra is False:
+                self.emit(ind, f"if not {allowed}.issuperset({v}):")
+                self.emit(ind + 1, f"for {k} in {v}:")
+                self.emit(ind + 2, f"if {k} not in {allowed}:")
+                self.error(ind + 3, path, errs, f"'unexpected key ' + repr({k})")
+            else:
+                x = self.var("_x")
+                self.emit(ind, f"for {k}, {x} in {v}.items():")
+                self.block(
+                    ind + 1,
+                    [f"if {k} not in {allowed}:"],
+                    lambda j: self.node(extra, x, [*path, "'.'", k], errs, j),
+                )
+
+    def prop(self, sub: Any, v: str, key: str, x: str, path: list[str], errs: str, ind: int) -> None:
+        self.emit(ind, f"{x} = {v}[{key!r}]")
+        mark = len(self.lines)
+        self.node(sub, x, [*path, repr(f".{key}")], errs, ind)
+        if len(self.lines) == mark:
+            self.lines.pop()
+
+
+def compile_schema(schema: dict[str, Any], name: str = "check") -> Callable[[Any], list[str]]:
+    """Return `check(value) -> list[str]` of "<json path>: <message>" errors."""
+    c = _Compiler(schema)
+    c.emit(0, f"def {name}(_v):")
+    c.emit(1, "_errs = []")
+    c.node(schema, "_v", ["'$'"], "_errs", 1)
+    c.emit(1, "return _errs")
+    source = "\n".join(c.lines) + "\n"
+    exec(compile(source, f"<schema:{schema.get('title', name)}>", "exec"), c.ns)
+    fn = c.ns[name]
+    fn.source = source  # type: ignore[attr-defined]
+    return fn
+
+
+def load_schema_check(path: Path) -> Callable[[Any], list[str]]:
+    return compile_schema(json.loads(path.read_text(encoding="utf-8")))
+
+
+def prompt_keys(prompt_text: str) -> list[str]:
+    """Keys listed after "...with these exact keys" in the extraction prompt."""
+    lines = prompt_text.splitlines()
+    for i, line in enumerate(lines):
+        if "exact keys" in line:
+            for nxt in lines[i + 1 :]:
+                if nxt.strip():
+                    return re.findall(r"'([A-Za-z0-9_]+)'", nxt)
+    return []
@@ -1,7 +1,25 @@
 import argparse
+import hashlib
 import json
 import random
 from pathlib import Path
+from typing import Any
+
+
+def split_key(rec: dict[str, Any], key: str) -> str:
+    meta = rec.get("meta")
+    if key in ("filename", "group") and isinstance(meta, dict):
+        # group: near-duplicate cluster from dedup_jsonl.py --action group
+        v = meta.get("dup_group" if key == "group" else "filename")
+        if v:
+            return str(v)
+    return str(rec.get("id") or "")
+
+
+def hash_unit(seed: int, key: str) -> float:
+    """Stable value in [0, 1) for a record key (independent of order and of other records)."""
+    h = hashlib.sha1(f"{seed}:{key}".encode("utf-8")).digest()
+    return int.from_bytes(h[:8], "big") / float(1 << 64)
 
 
 def main() -> None:
@@ -12,6 +30,21 @@ def main() -> None:
     ap.add_argument("--train", type=float, default=0.9)
     ap.add_argument("--val", type=float, default=0.05)
     ap.add_argument("--test", type=float, default=0.05)
+    ap.add_argument(
+        "--mode",
+        choices=["shuffle", "hash"],
+        default="shuffle",
+        help=(
+            "shuffle: load all records and shuffle (exact ratios); hash: stream records and assign "
+            "each by a stable hash of its key, so existing records keep their split as data grows"
+        ),
+    )
+    ap.add_argument(
+        "--key",
+        choices=["id", "filename", "group"],
+        default="id",
+        help="hash mode: hash the record id, meta.filename or meta.dup_group (falls back to id)",
+    )
     args = ap.parse_args()
 
     in_path = Path(args.in_path)
@@ -24,6 +57,29 @@ def main() -> None:
     if any(r < 0 for r in ratios) or abs(sum(ratios) - 1.0) > 1e-6:
         raise SystemExit("Ratios must be non-negative and sum to 1.0")
 
+    if args.mode == "hash":
+        out_dir.mkdir(parents=True, exist_ok=True)
+        names = ("train", "val", "test")
+        counts = [0, 0, 0]
+        bounds = (args.train, args.train + args.val)
+        files = [(out_dir / f"{name}.jsonl").open("w", encoding="utf-8") for name in names]
+        try:
+            with in_path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    rec = json.loads(line)
+                    u = hash_unit(args.seed, split_key(rec, args.key) or line)
+                    i = 0 if u < bounds[0] else (1 if u < bounds[1] else 2)
+                    files[i].write(line)
+                    counts[i] += 1
+        finally:
+            for fh in files:
+                fh.close()
+        print(f"Wrote splits to {out_dir}")
+        print(f"train: {counts[0]}  val: {counts[1]}  test: {counts[2]}  total: {sum(counts)}")
+        return
+
     records: list[str] = []
     with in_path.open("r", encoding="utf-8") as f:
         for line in f:
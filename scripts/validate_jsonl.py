@@ -1,59 +1,57 @@
+import argparse
+import io
 import json
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterable
+
+from schema_check import compile_schema, load_schema_check, prompt_keys
+
+ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_SCHEMA = ROOT / "schemas" / "qwen_vl_pdf_extract.schema.json"
+DEFAULT_PROMPT = ROOT / "prompts" / "bl_extraction_prompt.txt"
+
+_record_check: Callable[[Any], list[str]] | None = None
+_payload_check: Callable[[Any], list[str]] | None = None
 
 
 def fail(msg: str) -> None:
     raise SystemExit(msg)
 
 
-def _is_nonempty_str(x: Any) -> bool:
-    return isinstance(x, str) and len(x.strip()) > 0
+def configure(schema_path: Path, payload_schema_path: Path | None = None, prompt_path: Path | None = None) -> None:
+    """Compile the record schema (and optional assistant payload schema) once per process."""
+    global _record_check, _payload_check
+    _record_check = load_schema_check(schema_path)
+    _payload_check = None
+    if payload_schema_path is not None:
+        schema = json.loads(payload_schema_path.read_text(encoding="utf-8"))
+        if prompt_path is not None and prompt_path.exists():
+            keys = set(prompt_keys(prompt_path.read_text(encoding="utf-8")))
+            props = set(schema.get("properties") or {})
+            if keys and keys != props:
+                fail(
+                    f"{payload_schema_path} does not match the keys in {prompt_path}: "
+                    f"missing {sorted(keys - props)}, extra {sorted(props - keys)}"
+                )
+        _payload_check = compile_schema(schema)
 
 
 def validate_record(obj: dict[str, Any], line_no: int) -> list[str]:
-    errors: list[str] = []
+    return [f"line {line_no}: {e}" for e in record_errors(obj)]
 
-    if not isinstance(obj, dict):
-        return [f"line {line_no}: record is not an object"]
 
-    if not _is_nonempty_str(obj.get("id")):
-        errors.append(f"line {line_no}: missing/invalid 'id'")
+def record_errors(obj: dict[str, Any]) -> list[str]:
+    """Problems with one record, without the line prefix."""
+    if _record_check is None:
+        configure(DEFAULT_SCHEMA)
+    errors = list(_record_check(obj))
 
-    messages = obj.get("messages")
+    messages = obj.get("messages") if isinstance(obj, dict) else None
     if not isinstance(messages, list) or len(messages) < 2:
-        errors.append(f"line {line_no}: 'messages' must be an array with >=2 items")
         return errors
 
-    for mi, msg in enumerate(messages):
-        if not isinstance(msg, dict):
-            errors.append(f"line {line_no}: messages[{mi}] is not an object")
-            continue
-
-        role = msg.get("role")
-        if role not in ("system", "user", "assistant"):
-            errors.append(f"line {line_no}: messages[{mi}].role invalid: {role!r}")
-
-        content = msg.get("content")
-        if not isinstance(content, list) or len(content) < 1:
-            errors.append(f"line {line_no}: messages[{mi}].content must be a non-empty array")
-            continue
-
-        for ci, item in enumerate(content):
-            if not isinstance(item, dict):
-                errors.append(f"line {line_no}: messages[{mi}].content[{ci}] is not an object")
-                continue
-            t = item.get("type")
-            if t == "text":
-                if not _is_nonempty_str(item.get("text")):
-                    errors.append(f"line {line_no}: messages[{mi}].content[{ci}] missing/invalid text")
-            elif t == "image":
-                if not _is_nonempty_str(item.get("image")):
-                    errors.append(f"line {line_no}: messages[{mi}].content[{ci}] missing/invalid image path")
-            else:
-                errors.append(f"line {line_no}: messages[{mi}].content[{ci}].type invalid: {t!r}")
-
     # Strongly recommended for SFT: last message should be assistant text-only JSON
     last = messages[-1]
     if isinstance(last, dict) and last.get("role") == "assistant":
@@ -64,38 +62,125 @@ def validate_record(obj: dict[str, Any], line_no: int) -> list[str]:
                 txt = first.get("text")
                 if isinstance(txt, str):
                     try:
-                        json.loads(txt)
+                        payload = json.loads(txt)
                     except Exception:
                         errors.append(
-                            f"line {line_no}: assistant content[0].text is not valid JSON; "
-                            "for extraction, prefer strict JSON"
+                            "assistant content[0].text is not valid JSON; for extraction, prefer strict JSON"
                         )
+                    else:
+                        if _payload_check is not None:
+                            errors.extend(f"assistant payload {e}" for e in _payload_check(payload))
 
     return errors
 
 
-def main(argv: list[str]) -> None:
-    if len(argv) != 2:
-        fail("Usage: python scripts\\validate_jsonl.py <path-to-jsonl>")
+def _scan_lines(lines: Iterable[str]) -> tuple[int, int, list[tuple[int, str]]]:
+    """Validate JSONL lines; returns (records, lines, [(line number from 1, error)])."""
+    total = 0
+    line_no = 0
+    errors: list[tuple[int, str]] = []
+    for line_no, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        total += 1
+        try:
+            obj = json.loads(line)
+        except Exception as e:
+            errors.append((line_no, f"invalid JSON: {e}"))
+            continue
+        errors.extend((line_no, e) for e in record_errors(obj))
+    return total, line_no, errors
+
+
+def validate_lines(lines: Iterable[str], first_line_no: int = 1) -> tuple[int, list[str]]:
+    """Validate JSONL lines; returns (records, errors)."""
+    total, _, errors = _scan_lines(lines)
+    return total, [f"line {first_line_no - 1 + n}: {e}" for n, e in errors]
+
+
+def byte_ranges(path: Path, n: int) -> list[tuple[int, int]]:
+    """Split a file into about `n` byte ranges, each ending just after a newline."""
+    size = path.stat().st_size
+    if size == 0:
+        return []
+    step = max(1, size // n)
+    bounds = [0]
+    with path.open("rb") as f:
+        while bounds[-1] < size:
+            pos = bounds[-1] + step
+            if pos >= size:
+                bounds.append(size)
+                break
+            f.seek(pos - 1)
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    return list(zip(bounds[:-1], bounds[1:]))
+
 
-    path = Path(argv[1])
+def _read_range(path: str, start: int, end: int) -> str:
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return data.decode("utf-8")
+
+
+def _validate_range(path: str, start: int, end: int) -> tuple[int, int, list[tuple[int, str]]]:
+    """(records, lines, errors) of one byte range, with line numbers relative to the range."""
+    # Same universal-newline splitting as the serial text-mode read.
+    text = io.StringIO(_read_range(path, start, end), newline=None)
+    return _scan_lines(text)
+
+
+def main(argv: list[str]) -> None:
+    ap = argparse.ArgumentParser(usage="python scripts\\validate_jsonl.py <path-to-jsonl> [--workers N]")
+    ap.add_argument("path")
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="validate newline-aligned byte ranges in N processes (output matches the serial run)",
+    )
+    ap.add_argument("--schema", default=str(DEFAULT_SCHEMA), help="JSON Schema for each record")
+    ap.add_argument(
+        "--payload-schema",
+        default="",
+        help="also validate the assistant JSON (e.g. schemas/bl_extraction_payload.schema.json)",
+    )
+    ap.add_argument(
+        "--prompt",
+        default=str(DEFAULT_PROMPT),
+        help="prompt whose key list the payload schema must match",
+    )
+    args = ap.parse_args(argv[1:])
+
+    path = Path(args.path)
     if not path.exists():
         fail(f"File not found: {path}")
 
+    config = (
+        Path(args.schema),
+        Path(args.payload_schema) if args.payload_schema else None,
+        Path(args.prompt) if args.prompt else None,
+    )
+    configure(*config)
+
     total = 0
     all_errors: list[str] = []
 
-    with path.open("r", encoding="utf-8") as f:
-        for line_no, line in enumerate(f, start=1):
-            if not line.strip():
-                continue
-            total += 1
-            try:
-                obj = json.loads(line)
-            except Exception as e:
-                all_errors.append(f"line {line_no}: invalid JSON: {e}")
-                continue
-            all_errors.extend(validate_record(obj, line_no))
+    if args.workers > 1:
+        ranges = byte_ranges(path, args.workers * 4)
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=configure, initargs=config) as pool:
+            futures = [pool.submit(_validate_range, str(path), a, b) for a, b in ranges]
+            # ranges come back in file order; each range's line numbers start after the previous ranges' lines
+            offset = 0
+            for fut in futures:
+                n_records, n_lines, errors = fut.result()
+                total += n_records
+                all_errors.extend(f"line {offset + n}: {e}" for n, e in errors)
+                offset += n_lines
+    else:
+        with path.open("r", encoding="utf-8") as f:
+            total, all_errors = validate_lines(f)
 
     if all_errors:
         print("FAILED")
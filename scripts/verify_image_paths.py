@@ -1,8 +1,18 @@
 import argparse
 import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Any
 
+from image_manifest import ImageManifest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "training"))
+
+from zip_images import is_zip_uri, open_zip_image, source_stat, zip_member_exists  # noqa: E402
+
 
 def get_image_path(rec: dict[str, Any]) -> str:
     msgs = rec.get("messages")
@@ -20,10 +30,111 @@ def get_image_path(rec: dict[str, Any]) -> str:
     return ""
 
 
+def check_image(path: str) -> dict[str, Any]:
+    """Open the header and fully decode one image or zip:// member (runs in a worker process)."""
+    from PIL import Image
+
+    # we report oversized images ourselves instead of failing on PIL's bomb guard
+    Image.MAX_IMAGE_PIXELS = None
+
+    res: dict[str, Any] = {
+        "file_size": None,
+        "mtime_ns": None,
+        "format": None,
+        "size": None,
+        "mode": None,
+        "decode_ms": None,
+        "error": None,
+    }
+    try:
+        # inside the try: a file can vanish or become unreadable after it was listed
+        res["file_size"], res["mtime_ns"] = source_stat(path)
+        with open_zip_image(path) if is_zip_uri(path) else open(path, "rb") as f:
+            img = Image.open(f)
+            res["format"] = img.format
+            res["size"] = list(img.size)
+            res["mode"] = img.mode
+            t0 = time.perf_counter()
+            img.load()
+            res["decode_ms"] = round((time.perf_counter() - t0) * 1000.0, 3)
+    except Exception as e:
+        res["error"] = f"{type(e).__name__}: {e}"
+    return res
+
+
+def load_check_cache(path: Path) -> dict[str, dict[str, Any]]:
+    if not path.exists():
+        return {}
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def decode_check(
+    paths: list[str], cache_path: Path | None, workers: int
+) -> tuple[dict[str, dict[str, Any]], int]:
+    """Return ({path: result}, cache hits); only images whose size/mtime changed are decoded."""
+    cache = load_check_cache(cache_path) if cache_path is not None else {}
+    results: dict[str, dict[str, Any]] = {}
+    todo: list[str] = []
+    for p in paths:
+        hit = cache.get(p)
+        if hit is not None:
+            try:
+                sig = source_stat(p)
+            except (OSError, KeyError, ValueError):
+                sig = None
+            if sig is not None and [hit.get("file_size"), hit.get("mtime_ns")] == list(sig):
+                results[p] = hit
+                continue
+        todo.append(p)
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+            chunk = max(1, len(todo) // (max(1, workers) * 8))
+            for p, res in zip(todo, pool.map(check_image, todo, chunksize=chunk)):
+                results[p] = res
+                cache[p] = res
+
+    if cache_path is not None:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_name(cache_path.name + ".tmp")
+        tmp.write_text(json.dumps(cache, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, cache_path)
+    return results, len(paths) - len(todo)
+
+
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--in", dest="in_path", default="data/train.jsonl")
     ap.add_argument("--out-missing", default="docs/missing_image_files.txt")
+    ap.add_argument(
+        "--manifest",
+        default="",
+        help="image manifest written by build_jsonl_from_results.py --manifest; avoids one stat per record",
+    )
+    ap.add_argument(
+        "--images-dir",
+        action="append",
+        default=[],
+        help="roots to refresh in the manifest (repeatable; default: roots already in the manifest)",
+    )
+    ap.add_argument(
+        "--decode",
+        action="store_true",
+        help="also fully decode every existing image (files and zip:// members) in a process pool",
+    )
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes for --decode")
+    ap.add_argument(
+        "--decode-cache",
+        default="docs/image_check_cache.json",
+        help="decode results keyed by path, size and mtime; unchanged images are not re-checked ('' = off)",
+    )
+    ap.add_argument("--report", default="docs/image_check_report.json", help="--decode report (JSON)")
+    ap.add_argument("--max-aspect", type=float, default=8.0, help="flag images with long/short side above this")
+    ap.add_argument("--max-pixels", type=int, default=40_000_000, help="flag images with more pixels than this")
     args = ap.parse_args()
 
     in_path = Path(args.in_path)
@@ -32,7 +143,19 @@ def main() -> None:
 
     cwd = Path.cwd().resolve()
 
+    known: set[str] = set()
+    if args.manifest:
+        manifest_path = Path(args.manifest)
+        manifest = ImageManifest.load(manifest_path)
+        roots = [Path(p) for p in args.images_dir] or [Path(k) for k in manifest.roots]
+        for root in roots:
+            if root.exists():
+                manifest.refresh(root)
+        manifest.save(manifest_path)
+        known = manifest.resolved_paths()
+
     missing: list[str] = []
+    present: list[str] = []
     total = 0
 
     with in_path.open("r", encoding="utf-8") as f:
@@ -45,11 +168,21 @@ def main() -> None:
             if not img:
                 missing.append(f"<no-image-field>\t{rec.get('id','')}")
                 continue
+            if img.startswith("zip://"):
+                # checked against the archive's central directory, indexed once per archive
+                if not zip_member_exists(img):
+                    missing.append(f"{img}\t{rec.get('id','')}")
+                else:
+                    present.append(img)
+                continue
             p = Path(img)
             if not p.is_absolute():
                 p = (cwd / p).resolve()
-            if not p.exists():
+            # Manifest hits skip the stat; anything else (symlinks, other roots) falls back to it.
+            if str(p) not in known and not p.exists():
                 missing.append(f"{img}\t{rec.get('id','')}")
+            else:
+                present.append(str(p))
 
     out_path = Path(args.out_missing)
     out_path.parent.mkdir(parents=True, exist_ok=True)
@@ -58,6 +191,45 @@ def main() -> None:
     print(f"checked: {total}")
     print(f"missing files: {len(missing)} -> {out_path}")
 
+    if args.decode:
+        unique = list(dict.fromkeys(present))
+        cache_path = Path(args.decode_cache) if args.decode_cache else None
+        t0 = time.perf_counter()
+        results, hits = decode_check(unique, cache_path, args.workers)
+        elapsed = time.perf_counter() - t0
+
+        corrupt: list[dict[str, Any]] = []
+        extreme_aspect: list[dict[str, Any]] = []
+        oversized: list[dict[str, Any]] = []
+        for p in unique:
+            res = results[p]
+            if res.get("error"):
+                corrupt.append({"path": p, "error": res["error"]})
+                continue
+            w, h = res["size"]
+            if min(w, h) <= 0 or max(w, h) / min(w, h) > args.max_aspect:
+                extreme_aspect.append({"path": p, "size": [w, h]})
+            if w * h > args.max_pixels:
+                oversized.append({"path": p, "size": [w, h]})
+
+        decode_ms = sorted(r["decode_ms"] for r in results.values() if r.get("decode_ms") is not None)
+        report = {
+            "images": len(unique),
+            "cache_hits": hits,
+            "decode_ms_p50": decode_ms[len(decode_ms) // 2] if decode_ms else None,
+            "decode_ms_max": decode_ms[-1] if decode_ms else None,
+            "corrupt": corrupt,
+            "extreme_aspect": extreme_aspect,
+            "oversized": oversized,
+        }
+        report_path = Path(args.report)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        report_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        print(f"decoded: {len(unique) - hits} (cached: {hits}) in {elapsed:.1f}s")
+        print(f"corrupt: {len(corrupt)}  extreme aspect: {len(extreme_aspect)}  oversized: {len(oversized)}")
+        print(f"report -> {report_path}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,263 @@
+"""Memory-mapped cache of preprocessed (decoded, resized, RGB uint8) training images.
+
+Build it once, offline, with the same preprocessing settings as training:
+
+  python training\\image_cache.py --in data\\train.jsonl --out data\\image_cache --image-max-side 1536 --decoder draft
+
+then pass `--image-cache data\\image_cache` to `train_qwen3vl_qlora.py`. With
+`--resize-mode grid` images are stored at the processor's patch-grid size, so
+the processor is needed too: add `--model Qwen/Qwen3-VL-8B-Instruct`.
+
+Layout of the cache directory:
+- `pixels-00000.bin`, ...: raw RGB rows of many images back to back
+- `index.json`: preprocessing settings plus, per source image,
+  [shard, offset, width, height, source mtime_ns]
+
+Entries are keyed by the resolved source path (or the `zip://` URI, with the
+archive's mtime). The collator maps each shard once per process and builds each
+image straight from the mapped pixels: one memcpy of the resized RGB image (PIL
+cannot share memory for 3-byte RGB, and the processor copies the pixels into
+its own tensors anyway), with no file read or decode. An entry is used only while
+the source mtime still matches; a cache built with different settings (e.g.
+another `image_max_side`, `decoder`, `resize_mode` or `--autocrop`) is rejected
+as a whole.
+"""
+
+import argparse
+import json
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from PIL import Image
+
+from zip_images import is_zip_uri, parse_zip_uri
+
+INDEX_NAME = "index.json"
+CACHE_VERSION = 1
+
+
+def source_key(value: Any) -> tuple[str, Path] | None:
+    """(cache key, file whose mtime guards it) for an image field; None if not cacheable."""
+    if isinstance(value, dict):
+        for k in ("path", "image", "file", "filename"):
+            if k in value and value[k]:
+                value = value[k]
+                break
+    if isinstance(value, Path):
+        value = str(value)
+    if not isinstance(value, str) or not value.strip():
+        return None
+    if is_zip_uri(value):
+        try:
+            archive, member = parse_zip_uri(value)
+        except ValueError:
+            return None
+        return f"zip://{archive}#{member}", archive
+    p = Path(value)
+    if not p.is_absolute():
+        p = (Path.cwd() / p).resolve()
+    return str(p), p
+
+
+def _mtime_ns(path: Path) -> int | None:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ImageCache:
+    """Read side: PIL images built from the memory-mapped shards."""
+
+    def __init__(self, root: Path, settings: dict[str, Any], entries: dict[str, list[int]]):
+        self.root = root
+        self.settings = settings
+        self.entries = entries
+        self._maps: dict[int, mmap.mmap] = {}
+        self._pid = os.getpid()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def open(cls, root: Path) -> "ImageCache":
+        index_path = root / INDEX_NAME
+        if not index_path.exists():
+            raise SystemExit(f"Image cache index not found: {index_path}")
+        data = json.loads(index_path.read_text(encoding="utf-8"))
+        if data.get("version") != CACHE_VERSION:
+            raise SystemExit(f"Unsupported image cache version in {index_path}: {data.get('version')!r}")
+        return cls(root, data.get("settings") or {}, data.get("entries") or {})
+
+    def _shard(self, shard: int) -> mmap.mmap:
+        if self._pid != os.getpid():
+            # forked DataLoader worker: map the shards again in this process
+            self._maps = {}
+            self._pid = os.getpid()
+        mm = self._maps.get(shard)
+        if mm is None:
+            with (self.root / f"pixels-{shard:05d}.bin").open("rb") as f:
+                mm = self._maps[shard] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return mm
+
+    def get(self, value: Any) -> Image.Image | None:
+        """Cached image for a record's image field, or None (missing, stale or uncacheable)."""
+        key = source_key(value)
+        entry = self.entries.get(key[0]) if key is not None else None
+        if entry is None or _mtime_ns(key[1]) != entry[4]:
+            self.misses += 1
+            return None
+        shard, offset, w, h, _ = entry
+        view = memoryview(self._shard(shard))[offset : offset + w * h * 3]
+        self.hits += 1
+        # copies: frombuffer only shares memory for 1- and 4-byte modes
+        return Image.frombuffer("RGB", (w, h), view, "raw", "RGB", 0, 1)
+
+
+def build_image_cache(
+    sources: list[str],
+    out_dir: Path,
+    settings: dict[str, Any],
+    load_image: Any,
+    workers: int = 8,
+    shard_bytes: int = 2 << 30,
+) -> tuple[int, int, int]:
+    """Preprocess `sources` with `load_image(value) -> PIL.Image` into `out_dir`.
+
+    Up-to-date entries of an existing cache with the same settings are kept; new
+    images go to new shards. Returns (reused, written, failed).
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    index_path = out_dir / INDEX_NAME
+    entries: dict[str, list[int]] = {}
+    next_shard = 0
+    if index_path.exists():
+        try:
+            old = json.loads(index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            old = {}
+        if old.get("version") == CACHE_VERSION and old.get("settings") == settings:
+            entries = old.get("entries") or {}
+            next_shard = 1 + max((e[0] for e in entries.values()), default=-1)
+        else:
+            for p in out_dir.glob("pixels-*.bin"):
+                p.unlink()
+
+    todo: dict[str, tuple[str, Path]] = {}
+    reused = 0
+    for value in sources:
+        key = source_key(value)
+        if key is None or key[0] in todo:
+            continue
+        entry = entries.get(key[0])
+        if entry is not None and _mtime_ns(key[1]) == entry[4]:
+            reused += 1
+            continue
+        entries.pop(key[0], None)
+        todo[key[0]] = (value, key[1])
+
+    def work(item: tuple[str, tuple[str, Path]]) -> tuple[str, Image.Image | None, int | None]:
+        key, (value, guard) = item
+        mtime = _mtime_ns(guard)
+        try:
+            img = load_image(value).convert("RGB")
+        except Exception:
+            return key, None, None
+        return key, img, mtime
+
+    written = failed = 0
+    shard, f, offset = next_shard, None, 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for key, img, mtime in pool.map(work, todo.items()):
+                if img is None or mtime is None:
+                    failed += 1
+                    continue
+                data = img.tobytes()
+                if f is None or (offset and offset + len(data) > shard_bytes):
+                    if f is not None:
+                        f.close()
+                        shard += 1
+                    f = (out_dir / f"pixels-{shard:05d}.bin").open("wb")
+                    offset = 0
+                f.write(data)
+                entries[key] = [shard, offset, img.width, img.height, mtime]
+                offset += len(data)
+                written += 1
+    finally:
+        if f is not None:
+            f.close()
+
+    # Drop shards no entry points at any more (e.g. every image in them changed).
+    live = {e[0] for e in entries.values()}
+    for p in out_dir.glob("pixels-*.bin"):
+        if int(p.stem.split("-")[1]) not in live:
+            p.unlink()
+
+    tmp = index_path.with_name(index_path.name + ".tmp")
+    tmp.write_text(
+        json.dumps({"version": CACHE_VERSION, "settings": settings, "entries": entries}, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    os.replace(tmp, index_path)
+    return reused, written, failed
+
+
+def main() -> None:
+    from image_decode import DECODERS, RESAMPLING
+    from train_qwen3vl_qlora import Collator
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--in", dest="in_paths", nargs="+", required=True, help="training JSONL file(s) ({image,...})")
+    ap.add_argument("--out", required=True, help="cache directory")
+    ap.add_argument("--image-max-side", type=int, default=1536, help="must match training")
+    ap.add_argument("--decoder", default="pil", choices=sorted(DECODERS), help="must match training")
+    ap.add_argument("--resize-mode", default="long-side", choices=["long-side", "grid"], help="must match training")
+    ap.add_argument("--resample", default="bicubic", choices=sorted(RESAMPLING), help="must match training")
+    ap.add_argument("--autocrop", action="store_true", help="crop blank margins first; must match training")
+    ap.add_argument("--model", default="", help="processor to take the patch grid from (--resize-mode grid)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--shard-mb", type=int, default=2048)
+    args = ap.parse_args()
+
+    sources: list[str] = []
+    for p in args.in_paths:
+        with open(p, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    v = json.loads(line).get("image")
+                    if v:
+                        sources.append(v)
+
+    processor = None
+    if args.resize_mode == "grid":
+        if not args.model:
+            raise SystemExit("--resize-mode grid needs --model (the processor's patch size and pixel limits)")
+        from transformers import AutoProcessor
+
+        processor = AutoProcessor.from_pretrained(args.model, trust_remote_code=True)
+    collator = Collator(
+        processor=processor,
+        image_max_side=args.image_max_side,
+        max_length=0,
+        decoder=args.decoder,
+        resize_mode=args.resize_mode,
+        resample=args.resample,
+        autocrop=args.autocrop,
+    )
+    reused, written, failed = build_image_cache(
+        sources,
+        Path(args.out),
+        collator.image_settings(),
+        collator._decode_image,
+        workers=args.workers,
+        shard_bytes=args.shard_mb << 20,
+    )
+    print(f"images: {len(set(sources))}  reused: {reused}  written: {written}  failed: {failed}")
+    print(f"cache -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Crop blank margins and scanner-bed areas off document scans before resizing.
+
+`content_box` finds the content bounding box on a small grayscale copy (long
+side <= `ANALYSIS_SIDE`) with vectorized projections: a row or column is blank
+when almost none of its pixels differ from that line's median by more than
+`threshold`, which covers white paper margins as well as uniform dark scanner
+bed. Blank lines are trimmed from each edge, alternating columns and rows on the
+trimmed region until nothing changes (once the scanner bed is gone, the page's
+own white margins become blank lines too), a small `pad` is added back, and the
+box is dropped if it would remove less than `min_gain` of the area.
+
+Training applies it with `--autocrop` inside the image decoders (see
+`image_decode.py`), before the long-side resize. Inference preprocessing must
+do the same, e.g. `crop_margins(Image.open(path).convert("RGB"))` before
+resizing and sending the image, or the model sees differently framed documents
+than it was trained on; `run_info.json` records whether training cropped.
+
+Report the image-token reduction on a dataset:
+
+  python training\\image_crop.py --in data\\train.sft.jsonl --model Qwen/Qwen3-VL-8B-Instruct --image-max-side 1536
+"""
+
+import argparse
+import json
+import math
+from typing import Any, Sequence
+
+import numpy as np
+from PIL import Image
+
+ANALYSIS_SIDE = 512
+MAX_PASSES = 4
+Box = tuple[int, int, int, int]  # left, top, right, bottom
+
+
+def _trim(mask: np.ndarray, min_frac: float) -> tuple[int, int] | None:
+    """First and one-past-last index whose share of True values is >= min_frac."""
+    filled = np.flatnonzero(mask.mean(axis=1) >= min_frac)
+    if filled.size == 0:
+        return None
+    return int(filled[0]), int(filled[-1]) + 1
+
+
+def _deviants(gray: np.ndarray, threshold: int) -> np.ndarray:
+    """Pixels differing from their row's median by more than threshold."""
+    return np.abs(gray - np.median(gray, axis=1, keepdims=True)) > threshold
+
+
+def content_box(
+    img: Image.Image,
+    threshold: int = 40,
+    min_frac: float = 0.004,
+    pad: float = 0.01,
+    min_gain: float = 0.05,
+) -> Box | None:
+    """Content bounding box of `img` in its own pixel coordinates, or None if not worth cropping."""
+    w, h = img.size
+    gray_img = img.convert("L")
+    factor = max(1, math.ceil(max(w, h) / ANALYSIS_SIDE))
+    if factor > 1:
+        gray_img = gray_img.reduce(factor)
+    gray = np.asarray(gray_img, dtype=np.int16)
+    sh, sw = gray.shape
+
+    top, bottom, left, right = 0, sh, 0, sw
+    for _ in range(MAX_PASSES):
+        before = (top, bottom, left, right)
+        cols = _trim(_deviants(gray[top:bottom, left:right].T, threshold), min_frac)
+        if cols is None:
+            return None
+        left, right = left + cols[0], left + cols[1]
+        rows = _trim(_deviants(gray[top:bottom, left:right], threshold), min_frac)
+        if rows is None:
+            return None
+        top, bottom = top + rows[0], top + rows[1]
+        if (top, bottom, left, right) == before:
+            break
+
+    sx, sy = w / sw, h / sh
+    px, py = pad * w, pad * h
+    box = (
+        max(0, int(left * sx - px)),
+        max(0, int(top * sy - py)),
+        min(w, math.ceil(right * sx + px)),
+        min(h, math.ceil(bottom * sy + py)),
+    )
+    if (box[2] - box[0]) * (box[3] - box[1]) > (1 - min_gain) * w * h:
+        return None
+    return box
+
+
+def crop_margins(img: Image.Image) -> Image.Image:
+    """`img` cropped to its content box (unchanged if there is nothing worth cropping)."""
+    box = content_box(img)
+    return img.crop(box) if box is not None else img
+
+
+def scale_box(box: Box, from_size: Sequence[int], to_size: Sequence[int]) -> Box:
+    """Map a box between two resolutions of the same image, rounding outwards."""
+    sx, sy = to_size[0] / from_size[0], to_size[1] / from_size[1]
+    return (
+        int(box[0] * sx),
+        int(box[1] * sy),
+        min(to_size[0], math.ceil(box[2] * sx)),
+        min(to_size[1], math.ceil(box[3] * sy)),
+    )
+
+
+def main() -> None:
+    from transformers import AutoProcessor
+
+    from train_qwen3vl_qlora import Collator
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--in", dest="in_paths", nargs="+", required=True, help="training JSONL file(s) ({image,...})")
+    ap.add_argument("--model", default="Qwen/Qwen3-VL-8B-Instruct", help="processor to take the patch grid from")
+    ap.add_argument("--image-max-side", type=int, default=1536)
+    ap.add_argument("--decoder", default="pil")
+    ap.add_argument("--limit", type=int, default=0, help="only the first N images")
+    args = ap.parse_args()
+
+    sources: list[Any] = []
+    for p in args.in_paths:
+        with open(p, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    v = json.loads(line).get("image")
+                    if v:
+                        sources.append(v)
+    if args.limit:
+        sources = sources[: args.limit]
+
+    processor = AutoProcessor.from_pretrained(args.model, trust_remote_code=True)
+    plain = Collator(processor, args.image_max_side, max_length=0, decoder=args.decoder)
+    cropped = Collator(processor, args.image_max_side, max_length=0, decoder=args.decoder, autocrop=True)
+
+    before = after = changed = failed = 0
+    for value in sources:
+        try:
+            t0, h0, w0 = plain.image_grid(value)
+            t1, h1, w1 = cropped.image_grid(value)
+        except (OSError, ValueError):
+            failed += 1
+            continue
+        merge = plain._grid_config()[1] ** 2
+        before += t0 * h0 * w0 // merge
+        after += t1 * h1 * w1 // merge
+        changed += (h0, w0) != (h1, w1)
+
+    n = len(sources) - failed
+    if not n:
+        raise SystemExit("No readable images")
+    print(f"images: {n}  cropped: {changed} ({changed / n:.1%})  unreadable: {failed}")
+    print(f"image tokens/image: {before / n:.0f} -> {after / n:.0f} ({1 - after / max(before, 1):.1%} fewer)")
+
+
+if __name__ == "__main__":
+    main()
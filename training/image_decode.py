@@ -0,0 +1,134 @@
+"""Pluggable image decode backends for the training collator.
+
+A decoder takes an open binary file, a `target(w, h) -> (w, h)` function (the
+collator's resize rule), a PIL resampling filter, optionally a
+`stage_timing.StageTimer` and a `crop` flag, and returns an RGB image of exactly
+the target size. With `crop`, blank margins are cut off first (see
+`image_crop.py`) and the target is computed for the cropped size.
+Backends:
+
+- `pil`: decode at full resolution, then resize (the original path).
+- `draft`: for JPEG, ask libjpeg to decode directly at a 1/2, 1/4 or 1/8 scale
+  (DCT-domain downscaling, `Image.draft`) no smaller than the target, then do
+  the final resize. Other formats (PNG) are decoded in full and resized with
+  `reducing_gap`, which box-reduces by an integer factor (`Image.reduce`)
+  before the final resample. With `crop`, a JPEG is first decoded at 1/8 scale
+  to find the content box, then at the smallest scale that still covers the
+  target size of the cropped region.
+
+Add a backend with `@register_decoder("name")`; `--decoder name` selects it.
+"""
+
+import math
+import time
+from typing import Any, BinaryIO, Callable
+
+from PIL import Image
+
+from image_crop import content_box, scale_box
+
+TargetSize = Callable[[int, int], tuple[int, int]]
+Decoder = Callable[..., Image.Image]  # (f, target, resample, timer=None, crop=False)
+
+RESAMPLING = {
+    "nearest": Image.Resampling.NEAREST,
+    "box": Image.Resampling.BOX,
+    "bilinear": Image.Resampling.BILINEAR,
+    "hamming": Image.Resampling.HAMMING,
+    "bicubic": Image.Resampling.BICUBIC,
+    "lanczos": Image.Resampling.LANCZOS,
+}
+
+DECODERS: dict[str, Decoder] = {}
+
+
+def register_decoder(name: str) -> Callable[[Decoder], Decoder]:
+    def wrap(fn: Decoder) -> Decoder:
+        DECODERS[name] = fn
+        return fn
+
+    return wrap
+
+
+def get_decoder(name: str) -> Decoder:
+    try:
+        return DECODERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown image decoder {name!r} (available: {', '.join(sorted(DECODERS))})") from None
+
+
+@register_decoder("pil")
+def decode_full(
+    f: BinaryIO,
+    target: TargetSize,
+    resample: Image.Resampling = Image.Resampling.BICUBIC,
+    timer: Any = None,
+    crop: bool = False,
+) -> Image.Image:
+    t = time.perf_counter() if timer else 0.0
+    img = Image.open(f)
+    img.load()
+    img = img.convert("RGB")
+    if timer:
+        t = timer.add("decode", t)
+    if crop:
+        box = content_box(img)
+        if box is not None:
+            img = img.crop(box)
+        if timer:
+            t = timer.add("crop", t)
+    size = target(*img.size)
+    if size != img.size:
+        img = img.resize(size, resample)
+    if timer:
+        timer.add("resize", t)
+    return img
+
+
+@register_decoder("draft")
+def decode_draft(
+    f: BinaryIO,
+    target: TargetSize,
+    resample: Image.Resampling = Image.Resampling.BICUBIC,
+    timer: Any = None,
+    crop: bool = False,
+) -> Image.Image:
+    t = time.perf_counter() if timer else 0.0
+    start = f.tell() if crop else 0
+    img = Image.open(f)
+    full = img.size
+    box = None
+    if crop and img.format == "JPEG":
+        # find the content on a 1/8-scale grayscale decode, then reopen for the real decode
+        img.draft("L", (full[0] // 8, full[1] // 8))
+        img.load()
+        small_box = content_box(img)
+        box = scale_box(small_box, img.size, full) if small_box is not None else None
+        f.seek(start)
+        img = Image.open(f)
+        if timer:
+            t = timer.add("crop", t)
+    region = (box[2] - box[0], box[3] - box[1]) if box is not None else full
+    size = target(*region)
+    if img.format == "JPEG" and size != region:
+        # picks the largest DCT scale whose output still covers size on both sides (of the cropped region)
+        img.draft("RGB", (math.ceil(size[0] * full[0] / region[0]), math.ceil(size[1] * full[1] / region[1])))
+    img.load()
+    img = img.convert("RGB")
+    if timer:
+        t = timer.add("decode", t)
+    if box is not None:
+        img = img.crop(scale_box(box, full, img.size))
+    elif crop:
+        # not a JPEG: find the content on the full decode
+        box = content_box(img)
+        if box is not None:
+            img = img.crop(box)
+            size = target(*img.size)
+        if timer:
+            t = timer.add("crop", t)
+    if size != img.size:
+        img = img.resize(size, resample, reducing_gap=3.0)
+    if timer:
+        timer.add("resize", t)
+    return img
@@ -0,0 +1,135 @@
+"""Multimodal sequence packing for the training collator.
+
+A collated batch (padded rows, one image per sample) is re-laid out so several
+samples share one row of at most `max_length` tokens (first-fit decreasing):
+
+- `position_ids` has shape (4, rows, length): row 0 holds plain text positions
+  that restart at 0 for every sample, rows 1-3 the per-sample M-RoPE (t, h, w)
+  positions Qwen-VL computes in `get_rope_index`. Trailing padding forms its own
+  segment with its own restarting positions.
+- There is no 2D `attention_mask`: with position ids that restart per sample,
+  transformers builds a block-diagonal causal mask (sdpa/eager/flex) and
+  flash-attention gets the boundaries from `cu_seq_lens_q/k` and
+  `max_length_q/k` (cumulative segment lengths over the flattened rows).
+  The batch also sets `use_cache=False`: transformers skips packed-sequence
+  detection whenever a KV cache is present.
+- `pixel_values` / `image_grid_thw` are reordered to the order the images'
+  placeholder tokens appear in the packed rows.
+- The first label of every sample is ignored, so no token is trained to predict
+  the start of the next, unrelated sample.
+"""
+
+import torch
+
+
+def mrope_positions(
+    ids: torch.Tensor, grids: list[tuple[int, int, int]], merge: int, image_token_id: int
+) -> torch.Tensor:
+    """(3, n) M-RoPE positions of one unpadded sample, as Qwen-VL's `get_rope_index` lays them out for images."""
+    tokens = ids.tolist()
+    parts: list[torch.Tensor] = []
+    st = 0
+    nxt = 0  # next free position
+    for t, h, w in grids:
+        ed = tokens.index(image_token_id, st)
+        if ed > st:
+            parts.append(torch.arange(ed - st).view(1, -1).expand(3, -1) + nxt)
+            nxt += ed - st
+        gh, gw = h // merge, w // merge
+        t_index = torch.arange(t).view(-1, 1).expand(-1, gh * gw).flatten()
+        h_index = torch.arange(gh).view(1, -1, 1).expand(t, -1, gw).flatten()
+        w_index = torch.arange(gw).view(1, 1, -1).expand(t, gh, -1).flatten()
+        block = torch.stack([t_index, h_index, w_index]) + nxt
+        parts.append(block)
+        nxt = int(block.max()) + 1
+        st = ed + t * gh * gw
+    if st < len(tokens):
+        parts.append(torch.arange(len(tokens) - st).view(1, -1).expand(3, -1) + nxt)
+    return torch.cat(parts, dim=1) if parts else torch.zeros((3, 0), dtype=torch.long)
+
+
+def first_fit_rows(lengths: list[int], max_length: int) -> list[list[int]]:
+    """Group sample indices into rows of at most `max_length` tokens (first-fit decreasing)."""
+    rows: list[list[int]] = []
+    room: list[int] = []
+    for i in sorted(range(len(lengths)), key=lambda i: -lengths[i]):
+        for r, free in enumerate(room):
+            if lengths[i] <= free:
+                rows[r].append(i)
+                room[r] -= lengths[i]
+                break
+        else:
+            rows.append([i])
+            room.append(max_length - lengths[i])
+    return rows
+
+
+def pack_batch(
+    batch: dict[str, torch.Tensor],
+    max_length: int,
+    pad_token_id: int,
+    merge: int,
+    image_token_id: int,
+) -> dict[str, torch.Tensor]:
+    """Repack a padded collator batch (one image per sample) into packed rows."""
+    input_ids = batch["input_ids"]
+    labels = batch["labels"]
+    attention_mask = batch.get("attention_mask")
+    if attention_mask is None:
+        attention_mask = torch.ones_like(input_ids)
+    grid_thw = batch.get("image_grid_thw")
+    pixel_values = batch.get("pixel_values")
+
+    samples = []
+    for i in range(input_ids.shape[0]):
+        keep = attention_mask[i].bool()
+        samples.append((input_ids[i][keep], labels[i][keep]))
+
+    # one image per sample, in batch order (the collator renders one image placeholder per record)
+    grids = [tuple(int(x) for x in g) for g in grid_thw.tolist()] if grid_thw is not None else []
+    patch_counts = [t * h * w for t, h, w in grids]
+    pixel_chunks = list(torch.split(pixel_values, patch_counts)) if pixel_values is not None else []
+
+    rows = first_fit_rows([len(ids) for ids, _ in samples], max_length)
+    width = max(sum(len(samples[i][0]) for i in row) for row in rows)
+
+    out_ids = torch.full((len(rows), width), pad_token_id, dtype=input_ids.dtype)
+    out_labels = torch.full((len(rows), width), -100, dtype=labels.dtype)
+    position_ids = torch.zeros((4, len(rows), width), dtype=torch.long)
+    seg_lens: list[int] = []
+    order: list[int] = []
+    for r, row in enumerate(rows):
+        pos = 0
+        for i in row:
+            ids, lab = samples[i]
+            n = len(ids)
+            sample_grids = [grids[i]] if grids else []
+            out_ids[r, pos : pos + n] = ids
+            out_labels[r, pos : pos + n] = lab
+            out_labels[r, pos] = -100
+            position_ids[0, r, pos : pos + n] = torch.arange(n)
+            position_ids[1:, r, pos : pos + n] = mrope_positions(ids, sample_grids, merge, image_token_id)
+            seg_lens.append(n)
+            order.extend([i] if grids else [])
+            pos += n
+        if pos < width:
+            position_ids[:, r, pos:] = torch.arange(width - pos)
+            seg_lens.append(width - pos)
+
+    cu = torch.zeros(len(seg_lens) + 1, dtype=torch.int32)
+    cu[1:] = torch.cumsum(torch.tensor(seg_lens, dtype=torch.int32), 0)
+    packed: dict[str, torch.Tensor] = {
+        "input_ids": out_ids,
+        "labels": out_labels,
+        "position_ids": position_ids,
+        "cu_seq_lens_q": cu,
+        "cu_seq_lens_k": cu,
+        "max_length_q": max(seg_lens),  # type: ignore[dict-item]
+        "max_length_k": max(seg_lens),  # type: ignore[dict-item]
+        "use_cache": False,  # type: ignore[dict-item]
+    }
+    if grids:
+        packed["image_grid_thw"] = grid_thw[order]
+    if pixel_chunks:
+        packed["pixel_values"] = torch.cat([pixel_chunks[i] for i in order])
+    return packed
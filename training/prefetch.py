@@ -0,0 +1,133 @@
+"""Thread-pool image prefetching for the training dataloader.
+
+An alternative to `--num-workers N`: instead of forking N processes (each with
+its own copy of the dataset and the processor), a plain dataloader in the main
+process yields raw feature lists. A thread pool decodes and resizes the images
+of the next K batches, and one background thread collates them (chat
+template, tokenizer, image processor) into a queue of at most K ready batches.
+PIL, the Rust tokenizer and torch release the GIL, so this work overlaps with
+the training step.
+
+The prefetched batches are exposed as an iterable dataset (`PrefetchBatches`)
+behind an ordinary `DataLoader`, and that loader is what `accelerator.prepare`
+wraps. The Trainer therefore still iterates the prepared loader on the main
+thread: end-of-dataloader / gradient-accumulation bookkeeping and
+`skip_first_batches` on resume work as without prefetching (skipped batches are
+still read and collated).
+
+Backpressure: when the queue is full the collating thread blocks, and no new
+images are submitted until it has taken the oldest batch, so a slow training
+step stops the readers instead of letting decoded images pile up.
+
+Example:
+  python training\\train_qwen3vl_qlora.py --train data\\train.sft.jsonl --prefetch-threads 8 --prefetch-batches 4
+"""
+
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Iterator
+
+from torch.utils.data import IterableDataset
+
+from stage_timing import StageTimer
+
+_END = object()
+
+
+def collate_features(features: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Dataloader collate_fn that leaves the batch as a list of records."""
+    return features
+
+
+def unbatched(batch: Any) -> Any:
+    """collate_fn of the loader over `PrefetchBatches`: its items are already batches."""
+    return batch
+
+
+class PrefetchBatches(IterableDataset):
+    """Collated batches of a dataloader yielding feature lists (`collate_features`), built ahead in threads.
+
+    `collator` is the training `Collator`: images go through its `_load_image`
+    (image cache, decoder, resize) in the pool and `collator(features, images)`
+    builds the batch. Wrap it as `DataLoader(PrefetchBatches(...), batch_size=None,
+    collate_fn=unbatched)`.
+    """
+
+    def __init__(self, loader: Any, collator: Any, threads: int = 8, batches: int = 4):
+        self.loader = loader
+        self.collator = collator
+        self.threads = max(1, threads)
+        self.batches = max(1, batches)
+
+    def __len__(self) -> int:
+        return len(self.loader)
+
+    def set_epoch(self, epoch: int) -> None:
+        """Called by accelerate's DataLoaderShard.set_epoch; forwarded to the sampler that shuffles."""
+        batch_sampler = self.loader.batch_sampler
+        for obj in (batch_sampler, getattr(batch_sampler, "sampler", None), self.loader.dataset):
+            if hasattr(obj, "set_epoch"):
+                obj.set_epoch(epoch)
+                return
+
+    def _collate(self, features: list[dict[str, Any]], futures: list[Future], timer: StageTimer | None) -> Any:
+        batch = self.collator(features, [f.result() for f in futures])
+        if timer is not None:
+            # image stages ran in the pool under this batch's own timer
+            batch["stage_times"] = timer.drain() + batch.get("stage_times", [])
+        return batch
+
+    def _produce(self, ready: queue.Queue, stop: threading.Event) -> None:
+        def put(item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    ready.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        pending: deque[tuple[list[dict[str, Any]], list[Future], StageTimer | None]] = deque()
+        try:
+            source = iter(self.loader)
+            with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="prefetch") as pool:
+
+                def submit() -> None:
+                    features = next(source, None)
+                    if features is not None:
+                        timer = StageTimer() if self.collator.stage_timer is not None else None
+                        futures = [pool.submit(self.collator._load_image, f.get("image"), timer) for f in features]
+                        pending.append((features, futures, timer))
+
+                for _ in range(self.batches):
+                    submit()
+                while pending and not stop.is_set():
+                    features, futures, timer = pending.popleft()
+                    submit()
+                    if not put(self._collate(features, futures, timer)):
+                        break
+                for _, futures, _ in pending:
+                    for f in futures:
+                        f.cancel()
+            put(_END)
+        except BaseException as e:  # re-raised in the training loop
+            put(e)
+
+    def __iter__(self) -> Iterator[Any]:
+        ready: queue.Queue = queue.Queue(maxsize=self.batches)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(ready, stop), name="prefetch-collate", daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop.set()
+            producer.join()
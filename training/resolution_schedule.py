@@ -0,0 +1,75 @@
+"""Progressive-resolution curriculum: train early steps with a smaller image_max_side.
+
+`--resolution-schedule 768:0.3,1024:0.6` trains with images capped at 768 px for
+the first 30% of optimizer steps, at 1024 px until 60%, and at the full
+`--image-max-side` afterwards. Image tokens grow with the pixel count, so the
+early steps are much shorter sequences.
+
+The current side lives in shared memory (`multiprocessing.RawValue`): the
+schedule, as a TrainerCallback, sets it at every step and the collator reads it
+in its resize, including in dataloader worker processes. Workers prefetch a
+few batches ahead, so a change takes effect a couple of batches late. While the
+side is below the full value the image and token caches (built at the full
+side) are bypassed. Evaluation ignores the schedule: `Qwen3VLTrainer` hands the
+eval dataloader a copy of the collator without it.
+"""
+
+import multiprocessing
+from typing import Any
+
+from transformers import TrainerCallback
+
+
+def parse_schedule(spec: str, full_side: int) -> list[tuple[int, float]]:
+    """Parse `768:0.3,1024:0.6` into [(768, 0.3), (1024, 0.6)]: side until that fraction of training."""
+    stages: list[tuple[int, float]] = []
+    for part in (p.strip() for p in spec.split(",")):
+        if not part:
+            continue
+        side, sep, until = part.partition(":")
+        try:
+            stage = (int(side), float(until))
+        except ValueError:
+            raise ValueError(f"Bad resolution stage {part!r} (expected <side>:<fraction>)") from None
+        if not sep or not 0 < stage[1] <= 1 or not 0 < stage[0] <= full_side:
+            raise ValueError(f"Bad resolution stage {part!r}: need 0 < side <= {full_side} and 0 < fraction <= 1")
+        if stages and (stage[1] <= stages[-1][1] or stage[0] < stages[-1][0]):
+            raise ValueError(f"Resolution stages must increase in fraction and not shrink in side: {spec!r}")
+        stages.append(stage)
+    return stages
+
+
+class ResolutionSchedule(TrainerCallback):
+    """Shared current image_max_side, advanced by training progress."""
+
+    def __init__(self, stages: list[tuple[int, float]], full_side: int):
+        self.stages = stages
+        self.full_side = full_side
+        # full side until training starts: lengths for --token-budget are computed before that
+        self._side = multiprocessing.RawValue("i", full_side)
+
+    @property
+    def side(self) -> int:
+        return self._side.value
+
+    def side_at(self, progress: float) -> int:
+        for side, until in self.stages:
+            if progress < until:
+                return side
+        return self.full_side
+
+    def _update(self, state: Any) -> None:
+        side = self.side_at(state.global_step / state.max_steps if state.max_steps else 1.0)
+        if side != self._side.value:
+            self._side.value = side
+            if state.is_world_process_zero:
+                print(f"Resolution schedule: image_max_side {side} from step {state.global_step}")
+
+    def on_train_begin(self, args: Any, state: Any, control: Any, **kwargs: Any) -> None:
+        self._update(state)
+
+    def on_step_begin(self, args: Any, state: Any, control: Any, **kwargs: Any) -> None:
+        self._update(state)
+
+    def on_train_end(self, args: Any, state: Any, control: Any, **kwargs: Any) -> None:
+        self._side.value = self.full_side
@@ -0,0 +1,106 @@
+"""Per-stage timing of the training collator.
+
+With `--stage-timing`, the collator times each stage of building a batch:
+
+- `io`: reading the image bytes (file, zip member or image cache)
+- `decode`: decoding to RGB pixels
+- `crop`: finding and cutting off blank margins (`--autocrop`)
+- `resize`: resizing to the training size
+- `template`: rendering the chat template
+- `processor`: the processor call (tokenization and image patches)
+- `tensors`: labels, padding and packing
+
+Each collator copy (one per dataloader worker) collects events in its own
+`StageTimer` and attaches them to the batch it returns as `batch["stage_times"]`.
+The trainer removes that key before the forward pass and feeds it to a
+`StageLog`, which adds mean and p95 milliseconds per sample for each stage to
+every Trainer log line and can export the whole timeline:
+
+  python training\\train_qwen3vl_qlora.py --train data\\train.sft.jsonl --stage-timing runs\\stages.csv
+
+Without `--stage-timing` the collator has no timer and the only cost is a
+`None` check per stage.
+"""
+
+import csv
+import json
+import math
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+STAGES = ("io", "decode", "crop", "resize", "template", "processor", "tensors")
+
+
+class StageTimer:
+    """Collector in one collator copy. Events are (stage, end wall time, seconds, samples)."""
+
+    def __init__(self) -> None:
+        self.events: list[tuple[str, float, float, int]] = []
+
+    def add(self, stage: str, start: float, samples: int = 1) -> float:
+        """Record `stage` as running from `start` (a `time.perf_counter()` value) until now; returns now."""
+        now = time.perf_counter()
+        self.events.append((stage, time.time(), now - start, samples))
+        return now
+
+    def drain(self) -> list[tuple[str, float, float, int, int]]:
+        """Events since the last call, tagged with this process id; the timer starts over."""
+        events, self.events = self.events, []
+        pid = os.getpid()
+        return [(*e, pid) for e in events]
+
+
+def _p95(values: list[float]) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(0.95 * len(ordered)) - 1)]
+
+
+class StageLog:
+    """Aggregation in the training process: per-log-window summaries and the full timeline."""
+
+    def __init__(self) -> None:
+        self.rows: list[dict[str, Any]] = []
+        self._window: dict[str, list[tuple[float, int]]] = defaultdict(list)
+
+    def update(self, events: list[tuple[str, float, float, int, int]], step: int) -> None:
+        for stage, wall, seconds, samples, pid in events:
+            self._window[stage].append((seconds, samples))
+            self.rows.append(
+                {
+                    "step": step,
+                    "time": wall,
+                    "worker": pid,
+                    "stage": stage,
+                    "ms": 1000 * seconds,
+                    "samples": samples,
+                }
+            )
+
+    def summary(self) -> dict[str, float]:
+        """`stage_ms/<stage>` (mean per sample) and `stage_ms_p95/<stage>` since the last summary."""
+        out: dict[str, float] = {}
+        for stage in sorted(self._window, key=lambda s: STAGES.index(s) if s in STAGES else len(STAGES)):
+            entries = self._window[stage]
+            total = sum(n for _, n in entries)
+            if not total:
+                continue
+            out[f"stage_ms/{stage}"] = round(1000 * sum(s for s, _ in entries) / total, 3)
+            out[f"stage_ms_p95/{stage}"] = round(1000 * _p95([s / n for s, n in entries if n]), 3)
+        self._window.clear()
+        return out
+
+    def export(self, path: Path) -> None:
+        """Write the timeline as CSV (`.csv`) or JSON (anything else)."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        if path.suffix.lower() == ".csv":
+            with tmp.open("w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=["step", "time", "worker", "stage", "ms", "samples"])
+                writer.writeheader()
+                writer.writerows(self.rows)
+        else:
+            tmp.write_text(json.dumps({"stages": list(STAGES), "events": self.rows}), encoding="utf-8")
+        os.replace(tmp, path)
@@ -0,0 +1,106 @@
+"""Training throughput and padding metrics, logged per logging step.
+
+`ThroughputCallback` is fed every batch the trainer fetches (by
+`Qwen3VLTrainer.get_batch_samples`, which also times how long the training
+loop waited on the dataloader) and, on each Trainer log, appends one JSON line
+to the metrics file (emptied when training starts) and prints one line:
+
+- `tokens_per_s`, `samples_per_s`: non-padding tokens and samples per second
+  of wall time since the previous log
+- `padding_share`: share of the batch slots (rows x longest row) that is padding
+- `image_tokens`, `text_tokens`, `image_token_share`: non-padding tokens split
+  by whether they are image placeholders
+- `dataloader_wait_s`, `dataloader_wait_share`: time the loop blocked on the
+  dataloader, absolute and as a share of the wall time
+- `peak_mem_gib`, `peak_reserved_gib`: peak CUDA memory allocated / reserved by
+  the allocator since the previous log (absent on CPU)
+
+Counts are for this process only (one GPU in a multi-GPU run).
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+import torch
+from transformers import TrainerCallback
+
+
+class ThroughputCallback(TrainerCallback):
+    def __init__(self, path: Path, image_token_id: int, pad_token_id: int):
+        self.path = path
+        self.image_token_id = image_token_id
+        self.pad_token_id = pad_token_id
+        self._reset(time.perf_counter())
+
+    def _reset(self, now: float) -> None:
+        self.window_start = now
+        self.samples = 0
+        self.slots = 0
+        self.tokens = 0
+        self.image_tokens = 0
+        self.wait = 0.0
+
+    def observe(self, batches: list[dict[str, Any]], wait: float) -> None:
+        """Count the batches of one fetch that blocked the training loop for `wait` seconds."""
+        self.wait += wait
+        for batch in batches:
+            input_ids = batch["input_ids"]
+            if "attention_mask" in batch and batch["attention_mask"] is not None:
+                real = batch["attention_mask"].sum()
+            else:
+                # packed rows: padding only after the last sample of a row
+                real = (input_ids != self.pad_token_id).sum()
+            image = (input_ids == self.image_token_id).sum()
+            real, image = torch.stack([real, image]).tolist()  # one device sync per batch
+            grid = batch.get("image_grid_thw")
+            self.samples += int(grid.shape[0]) if grid is not None else int(input_ids.shape[0])
+            self.slots += input_ids.numel()
+            self.tokens += real
+            self.image_tokens += image
+
+    def on_train_begin(self, args: Any, state: Any, control: Any, **kwargs: Any) -> None:
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+        if state.is_world_process_zero:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text("", encoding="utf-8")
+        self._reset(time.perf_counter())
+
+    def on_log(self, args: Any, state: Any, control: Any, logs: dict[str, float] | None = None, **kwargs: Any) -> None:
+        if not logs or "loss" not in logs:
+            return
+        now = time.perf_counter()
+        elapsed = max(now - self.window_start, 1e-9)
+        metrics: dict[str, Any] = {
+            "step": state.global_step,
+            "epoch": round(state.epoch or 0.0, 4),
+            "time": time.time(),
+            "loss": logs.get("loss"),
+            "samples": self.samples,
+            "tokens_per_s": round(self.tokens / elapsed, 1),
+            "samples_per_s": round(self.samples / elapsed, 3),
+            "padding_share": round(1 - self.tokens / self.slots, 4) if self.slots else None,
+            "image_tokens": self.image_tokens,
+            "text_tokens": self.tokens - self.image_tokens,
+            "image_token_share": round(self.image_tokens / self.tokens, 4) if self.tokens else None,
+            "dataloader_wait_s": round(self.wait, 3),
+            "dataloader_wait_share": round(self.wait / elapsed, 4),
+        }
+        if torch.cuda.is_available():
+            metrics["peak_mem_gib"] = round(torch.cuda.max_memory_allocated() / 2**30, 3)
+            metrics["peak_reserved_gib"] = round(torch.cuda.max_memory_reserved() / 2**30, 3)
+            torch.cuda.reset_peak_memory_stats()
+        self._reset(now)
+
+        if not state.is_world_process_zero:
+            return
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(metrics) + "\n")
+        mem = f"  peak mem {metrics['peak_mem_gib']:.2f} GiB" if "peak_mem_gib" in metrics else ""
+        print(
+            f"[step {state.global_step}] {metrics['tokens_per_s']:.0f} tok/s  {metrics['samples_per_s']:.2f} samples/s  "
+            f"padding {100 * (metrics['padding_share'] or 0):.1f}%  image tokens {metrics['image_tokens']} / "
+            f"text {metrics['text_tokens']}  dataloader wait {100 * metrics['dataloader_wait_share']:.1f}%{mem}"
+        )
@@ -0,0 +1,102 @@
+"""Token-budget batching for variable-size documents.
+
+Instead of a fixed number of samples per batch, each batch holds as many samples
+as fit under a padded-token budget (batch size x longest sequence in the batch).
+Samples are shuffled, cut into windows, sorted by length inside each window and
+packed greedily; the resulting batches are shuffled again, so batch composition
+and order still change every epoch while similar lengths end up together.
+"""
+
+import random
+from typing import Iterator
+
+
+def padding_ratio(batches: list[list[int]], lengths: list[int]) -> float:
+    """Share of padded positions when every batch is padded to its longest sample."""
+    real = padded = 0
+    for b in batches:
+        if not b:
+            continue
+        real += sum(lengths[i] for i in b)
+        padded += len(b) * max(lengths[i] for i in b)
+    return 1.0 - real / padded if padded else 0.0
+
+
+def fixed_size_batches(n: int, batch_size: int, seed: int = 0) -> list[list[int]]:
+    """Shuffled fixed-size batches (what the default Trainer sampler produces), for comparison."""
+    order = list(range(n))
+    random.Random(seed).shuffle(order)
+    return [order[i : i + batch_size] for i in range(0, n, max(1, batch_size))]
+
+
+class TokenBudgetBatchSampler:
+    """Yields lists of dataset indices whose padded token count stays within `max_tokens`.
+
+    A sample longer than the budget gets a batch of its own. `window` is the number
+    of samples sorted together; larger windows pad less but batches become more
+    uniform in length.
+    """
+
+    def __init__(
+        self,
+        lengths: list[int],
+        max_tokens: int,
+        shuffle: bool = True,
+        seed: int = 0,
+        window: int = 1024,
+        max_batch_size: int = 0,
+    ):
+        if max_tokens <= 0:
+            raise ValueError("max_tokens must be positive")
+        self.lengths = lengths
+        self.max_tokens = max_tokens
+        self.shuffle = shuffle
+        self.seed = seed
+        self.window = max(1, window)
+        self.max_batch_size = max_batch_size
+        self.epoch = 0
+        self._plan: tuple[int, list[list[int]]] | None = None
+
+    def set_epoch(self, epoch: int) -> None:
+        self.epoch = epoch
+
+    @property
+    def sampler(self) -> "TokenBudgetBatchSampler":
+        # Under DDP accelerate wraps this in a BatchSamplerShard, and DataLoaderShard.set_epoch only reaches it as
+        # `batch_sampler.sampler`; that call comes before the Trainer takes len() of the epoch, which depends on it.
+        return self
+
+    def batches(self) -> list[list[int]]:
+        if self._plan is not None and self._plan[0] == self.epoch:
+            return self._plan[1]
+        rng = random.Random(self.seed + self.epoch)
+        order = list(range(len(self.lengths)))
+        if self.shuffle:
+            rng.shuffle(order)
+
+        out: list[list[int]] = []
+        for start in range(0, len(order), self.window):
+            chunk = sorted(order[start : start + self.window], key=lambda i: self.lengths[i])
+            batch: list[int] = []
+            longest = 0
+            for i in chunk:
+                n = self.lengths[i]
+                full = self.max_batch_size and len(batch) >= self.max_batch_size
+                if batch and (full or (len(batch) + 1) * max(longest, n) > self.max_tokens):
+                    out.append(batch)
+                    batch, longest = [], 0
+                batch.append(i)
+                longest = max(longest, n)
+            if batch:
+                out.append(batch)
+
+        if self.shuffle:
+            rng.shuffle(out)
+        self._plan = (self.epoch, out)
+        return out
+
+    def __iter__(self) -> Iterator[list[int]]:
+        return iter(self.batches())
+
+    def __len__(self) -> int:
+        return len(self.batches())
@@ -0,0 +1,214 @@
+"""Offline pre-tokenization cache for the training collator.
+
+Every record is rendered through the chat template and tokenized once, exactly
+as `Collator.__call__` would do it (image placeholder expanded to the image's
+token count, truncation at `max_len`). At train time the collator only runs the
+image processor for `pixel_values`, then pads and stacks the cached ids.
+
+  python training\\token_cache.py --in data\\train.sft.jsonl --out data\\token_cache --model Qwen/Qwen3-VL-8B-Instruct --max-len 4096
+
+Layout of the cache directory:
+- `input_ids-00000.npy` (int32) and `label_mask-00000.npy` (uint8), ...: the
+  token streams of many records back to back, memory-mapped when read
+- `index.json`: the settings the cache was built with (transformers version,
+  tokenizer, chat template hash, processor image config, image_max_side,
+  max_len, autocrop) plus, per record key, [shard, offset, length, grid_t, grid_h, grid_w]
+
+Records are keyed by a hash of their image/prompt/response, so filtering or
+reordering the dataset does not invalidate the cache. A cache whose settings
+differ from the current run is rejected as a whole; a record whose image grid no
+longer matches (the image file changed size) falls back to live processing.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+INDEX_NAME = "index.json"
+CACHE_VERSION = 1
+
+
+def record_key(feature: dict[str, Any]) -> str:
+    h = hashlib.sha1()
+    for field in ("image", "prompt", "response"):
+        h.update(str(feature.get(field) or "").encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class TokenCache:
+    """Read side: memory-mapped token streams plus the per-record index."""
+
+    def __init__(self, root: Path, settings: dict[str, Any], entries: dict[str, list[int]]):
+        self.root = root
+        self.settings = settings
+        self.entries = entries
+        self._shards: dict[int, tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def open(cls, root: Path) -> "TokenCache":
+        index_path = root / INDEX_NAME
+        if not index_path.exists():
+            raise SystemExit(f"Token cache index not found: {index_path}")
+        data = json.loads(index_path.read_text(encoding="utf-8"))
+        if data.get("version") != CACHE_VERSION:
+            raise SystemExit(f"Unsupported token cache version in {index_path}: {data.get('version')!r}")
+        return cls(root, data.get("settings") or {}, data.get("entries") or {})
+
+    def _shard(self, shard: int) -> tuple[np.ndarray, np.ndarray]:
+        arrays = self._shards.get(shard)
+        if arrays is None:
+            arrays = self._shards[shard] = (
+                np.load(self.root / f"input_ids-{shard:05d}.npy", mmap_mode="r"),
+                np.load(self.root / f"label_mask-{shard:05d}.npy", mmap_mode="r"),
+            )
+        return arrays
+
+    def get(self, feature: dict[str, Any]) -> tuple[np.ndarray, np.ndarray, tuple[int, int, int]] | None:
+        """(input_ids, label_mask, image grid) views for a record, or None if it is not cached."""
+        entry = self.entries.get(record_key(feature))
+        if entry is None:
+            return None
+        shard, offset, length, t, gh, gw = entry
+        ids, mask = self._shard(shard)
+        return ids[offset : offset + length], mask[offset : offset + length], (t, gh, gw)
+
+
+def build_token_cache(
+    records: list[dict[str, Any]],
+    out_dir: Path,
+    collator: Any,
+    batch_size: int = 256,
+    shard_tokens: int = 64 << 20,
+) -> tuple[int, int]:
+    """Tokenize `records` into `out_dir` with `collator`'s processor and settings.
+
+    Returns (written, skipped); records whose image cannot be read, or whose image
+    tokens would be cut by truncation, are skipped and stay on the live path.
+    """
+    processor = collator.processor
+    tokenizer = processor.tokenizer
+    merge = int(processor.image_processor.merge_size)
+    image_token = getattr(processor, "image_token", "<|image_pad|>")
+    image_token_id = tokenizer.convert_tokens_to_ids(image_token)
+    pad_token_id = tokenizer.pad_token_id
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # New shards are numbered after every existing one, so the current index stays valid until it is replaced.
+    old_shards = list(out_dir.glob("input_ids-*.npy")) + list(out_dir.glob("label_mask-*.npy"))
+    first_shard = 1 + max((int(p.stem.split("-")[1]) for p in old_shards), default=-1)
+
+    entries: dict[str, list[int]] = {}
+    shard_ids: list[np.ndarray] = []
+    shard_masks: list[np.ndarray] = []
+    state = {"shard": first_shard, "offset": 0}
+    written = skipped = 0
+
+    def flush_shard() -> None:
+        if not shard_ids:
+            return
+        np.save(out_dir / f"input_ids-{state['shard']:05d}.npy", np.concatenate(shard_ids))
+        np.save(out_dir / f"label_mask-{state['shard']:05d}.npy", np.concatenate(shard_masks))
+        shard_ids.clear()
+        shard_masks.clear()
+        state["shard"] += 1
+        state["offset"] = 0
+
+    def tokenize(batch: list[tuple[str, str, tuple[int, int, int]]]) -> None:
+        nonlocal written, skipped
+        texts = []
+        for _, text, (t, gh, gw) in batch:
+            n = t * gh * gw // (merge**2)
+            texts.append(text.replace(image_token, "<|placeholder|>" * n, 1).replace("<|placeholder|>", image_token))
+        enc = tokenizer(texts, truncation=True, max_length=collator.max_length)["input_ids"]
+        for (key, _, grid), ids in zip(batch, enc):
+            arr = np.asarray(ids, dtype=np.int32)
+            if int((arr == image_token_id).sum()) != grid[0] * grid[1] * grid[2] // (merge**2):
+                skipped += 1
+                continue
+            mask = (arr != pad_token_id).astype(np.uint8) if pad_token_id is not None else np.ones_like(arr, np.uint8)
+            if state["offset"] and state["offset"] + len(arr) > shard_tokens:
+                flush_shard()
+            shard_ids.append(arr)
+            shard_masks.append(mask)
+            entries[key] = [state["shard"], state["offset"], len(arr), *grid]
+            state["offset"] += len(arr)
+            written += 1
+
+    batch: list[tuple[str, str, tuple[int, int, int]]] = []
+    for rec in records:
+        key = record_key(rec)
+        if key in entries:
+            continue
+        try:
+            grid = collator.image_grid(rec.get("image"))
+        except Exception:
+            skipped += 1
+            continue
+        batch.append((key, collator.render_text(str(rec["prompt"]), str(rec["response"])), grid))
+        if len(batch) >= batch_size:
+            tokenize(batch)
+            batch = []
+    if batch:
+        tokenize(batch)
+    flush_shard()
+
+    index_path = out_dir / INDEX_NAME
+    tmp = index_path.with_name(index_path.name + ".tmp")
+    tmp.write_text(
+        json.dumps(
+            {"version": CACHE_VERSION, "settings": collator.token_settings(), "entries": entries},
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    os.replace(tmp, index_path)
+    for p in old_shards:
+        try:
+            p.unlink()
+        except OSError:
+            # still memory-mapped by a running reader (Windows); removed by the next build
+            pass
+    return written, skipped
+
+
+def main() -> None:
+    from transformers import AutoProcessor
+
+    from train_qwen3vl_qlora import Collator
+
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--in", dest="in_paths", nargs="+", required=True, help="training JSONL file(s) ({image,prompt,response})")
+    ap.add_argument("--out", required=True, help="cache directory")
+    ap.add_argument("--model", default="Qwen/Qwen3-VL-8B-Instruct")
+    ap.add_argument("--max-len", type=int, default=4096, help="must match training")
+    ap.add_argument("--image-max-side", type=int, default=1536, help="must match training")
+    ap.add_argument(
+        "--autocrop",
+        action="store_true",
+        help="must match training; image token counts then come from decoding every image, not its header",
+    )
+    ap.add_argument("--batch-size", type=int, default=256, help="records per tokenizer call")
+    args = ap.parse_args()
+
+    records: list[dict[str, Any]] = []
+    for p in args.in_paths:
+        with open(p, "r", encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+
+    processor = AutoProcessor.from_pretrained(args.model, trust_remote_code=True)
+    collator = Collator(
+        processor=processor, image_max_side=args.image_max_side, max_length=args.max_len, autocrop=args.autocrop
+    )
+    written, skipped = build_token_cache(records, Path(args.out), collator, batch_size=max(1, args.batch_size))
+    print(f"records: {len(records)}  cached: {written}  skipped: {skipped}")
+    print(f"cache -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
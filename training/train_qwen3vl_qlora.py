@@ -4,23 +4,41 @@ Notes:
 - Multimodal fine-tuning support depends on your installed `transformers` version.
 - This script is designed for a RunPod Linux GPU environment (A6000).
 - It expects a JSONL dataset with fields: {id, image, prompt, response}.
+- `image` may be a file path or a `zip://<archive>#<member>` URI (read without extraction).
+- `--image-cache` reads pre-resized pixels from a cache built by `image_cache.py`.
+- `--token-cache` reads pre-tokenized records from a cache built by `token_cache.py`.
+- `--token-budget N` batches by padded token count (see `token_budget.py`) instead of `--batch`.
+- `--pack` packs several samples into each `--max-len` row (see `packing.py`).
+- `--resize-mode grid` resizes once, straight to the processor's patch grid.
+- `--prefetch-threads N` decodes images in a thread pool instead of `--num-workers` processes (see `prefetch.py`).
+- `--stage-timing PATH` logs per-stage collator timings and exports them (see `stage_timing.py`).
+- Throughput, padding and memory metrics go to `<out>/metrics.jsonl` (see `throughput.py`).
+- `--resolution-schedule` trains early steps at a smaller image size (see `resolution_schedule.py`).
+- `--autocrop` crops blank margins off scans before resizing (see `image_crop.py`).
+- `--streaming --max-steps N` reads sharded train JSONL lazily (no Arrow cache; missing images skipped on the fly).
 
 If the model/processor class names change, the first thing to adjust is the
 `AutoModelForVision2Seq` import and the processor usage.
 """
 
 import argparse
+import copy
+import hashlib
 import io
 import inspect
 import json
 import os
+import time
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO, Iterable
 
 import torch
-from datasets import load_dataset
+import transformers
+from accelerate.data_loader import SeedableRandomSampler
+from datasets import DatasetDict, load_dataset
 from PIL import Image
+from torch.utils.data import DataLoader
 from transformers import (
     AutoModelForVision2Seq,
     AutoProcessor,
@@ -30,6 +48,36 @@ from transformers import (
 
 from peft import LoraConfig, get_peft_model, prepare_model_for_kbit_training
 
+from image_cache import ImageCache
+from image_decode import DECODERS, RESAMPLING, get_decoder
+from packing import pack_batch
+from prefetch import PrefetchBatches, collate_features, unbatched
+from resolution_schedule import ResolutionSchedule, parse_schedule
+from stage_timing import StageLog, StageTimer
+from token_budget import TokenBudgetBatchSampler, fixed_size_batches, padding_ratio
+from throughput import ThroughputCallback
+from token_cache import TokenCache
+from zip_images import is_zip_uri, open_zip_image, zip_member_exists
+
+
+def _has_valid_image(ex: dict[str, Any]) -> bool:
+    v = ex.get("image")
+    if v is None:
+        return False
+    if isinstance(v, str) and not v.strip():
+        return False
+    if isinstance(v, str) and is_zip_uri(v):
+        return zip_member_exists(v)
+    try:
+        p = Path(str(v))
+    except Exception:
+        return False
+    if str(p) in {"", "."}:
+        return False
+    if not p.is_absolute():
+        p = (Path.cwd() / p).resolve()
+    return p.exists() and p.is_file()
+
 
 @dataclass
 class Batch:
@@ -53,16 +101,92 @@ def build_chat_messages(prompt: str, response: str) -> list[dict[str, Any]]:
 
 
 class Collator:
-    def __init__(self, processor: Any, image_max_side: int, max_length: int):
+    def __init__(
+        self,
+        processor: Any,
+        image_max_side: int,
+        max_length: int,
+        image_cache: ImageCache | None = None,
+        token_cache: TokenCache | None = None,
+        pack: bool = False,
+        decoder: str = "pil",
+        resize_mode: str = "long-side",
+        resample: str = "bicubic",
+        stage_timer: StageTimer | None = None,
+        resolution: ResolutionSchedule | None = None,
+        autocrop: bool = False,
+    ):
         self.processor = processor
         self.image_max_side = image_max_side
         self.max_length = max_length
+        self.image_cache = image_cache
+        self.token_cache = token_cache
+        self.pack = pack
+        self.decoder = decoder
+        self.decode = get_decoder(decoder)
+        if resize_mode not in ("long-side", "grid"):
+            raise ValueError(f"Unknown resize mode {resize_mode!r}")
+        self.resize_mode = resize_mode
+        self.resample = resample
+        self._resample = RESAMPLING[resample]
+        self.stage_timer = stage_timer
+        self.resolution = resolution
+        self.autocrop = autocrop
+
+    @property
+    def max_side(self) -> int:
+        """Current long-side cap: image_max_side, or the resolution schedule's current side."""
+        return self.resolution.side if self.resolution is not None else self.image_max_side
+
+    def _at_full_side(self) -> bool:
+        # the image and token caches hold full-side data
+        return self.resolution is None or self.resolution.side == self.image_max_side
+
+    def image_settings(self) -> dict[str, Any]:
+        """Everything `_decode_image` output depends on (besides the source file); keys the image cache."""
+        settings = {
+            "image_max_side": self.image_max_side,
+            "decoder": self.decoder,
+            "resize_mode": self.resize_mode,
+            "resample": self.resample,
+        }
+        if self.resize_mode == "grid":
+            # cached pixels are already at the processor's grid size
+            settings["grid"] = list(self._grid_config())
+        if self.autocrop:
+            settings["autocrop"] = True
+        return settings
+
+    def token_settings(self) -> dict[str, Any]:
+        """Everything cached token ids depend on (besides the record); keys the token cache."""
+        tok = self.processor.tokenizer
+        template = getattr(self.processor, "chat_template", None) or getattr(tok, "chat_template", None) or ""
+        patch, merge, min_pixels, max_pixels = self._grid_config()
+        settings = {
+            "transformers": transformers.__version__,
+            "processor": type(self.processor).__name__,
+            "image_processor": type(self.processor.image_processor).__name__,
+            "tokenizer": tok.name_or_path,
+            "vocab_size": len(tok),
+            "chat_template_sha1": hashlib.sha1(str(template).encode("utf-8")).hexdigest(),
+            "patch_size": patch,
+            "merge_size": merge,
+            "min_pixels": min_pixels,
+            "max_pixels": max_pixels,
+            "max_len": self.max_length,
+            "image_max_side": self.image_max_side,
+        }
+        if self.autocrop:
+            # cropping changes the image grid and so the number of image tokens
+            settings["autocrop"] = True
+        return settings
 
-    def _coerce_image_source(self, value: Any) -> tuple[str, io.BytesIO | None]:
+    def _coerce_image_source(self, value: Any) -> tuple[str, BinaryIO | None]:
         """Return (path, bytes_buf) where exactly one is set.
 
         Supports:
         - str / Path: filesystem path (relative paths resolved against CWD)
+        - str: `zip://<archive>#<member>` read from the archive without extraction
         - dict: tries common keys like {path}, {image}, {file}, {bytes}
         - bytes-like: in-memory image bytes
         """
@@ -88,6 +212,9 @@ class Collator:
                     value = value[k]
                     break
 
+        if isinstance(value, str) and is_zip_uri(value):
+            return ("", open_zip_image(value))
+
         if isinstance(value, Path):
             p = value
         else:
@@ -100,49 +227,223 @@ class Collator:
             p = (Path.cwd() / p).resolve()
         return (str(p), None)
 
-    def _load_image(self, image_value: Any) -> Image.Image:
+    def _load_image(self, image_value: Any, timer: StageTimer | None = None) -> Image.Image:
+        """`timer` (default: the collator's own) records the io/decode/crop/resize stages."""
+        timer = timer or self.stage_timer
+        if self.image_cache is not None and self._at_full_side():
+            t = time.perf_counter() if timer else 0.0
+            img = self.image_cache.get(image_value)
+            if img is not None:
+                if timer:
+                    timer.add("io", t)
+                return img
+        return self._decode_image(image_value, timer)
+
+    def _decode_image(self, image_value: Any, timer: StageTimer | None = None) -> Image.Image:
+        timer = timer or self.stage_timer
+        t = time.perf_counter() if timer else 0.0
         path, buf = self._coerce_image_source(image_value)
+        if buf is None and not path:
+            raise FileNotFoundError(
+                "Empty image path in dataset record (did you include missing-image docs?)"
+            )
+        if buf is None and timer:
+            # read the file up front so the decode stage does not include disk I/O
+            with open(path, "rb") as f:
+                buf = io.BytesIO(f.read())
 
         # Always open from a file-like object to avoid PIL path-detection edge cases.
         if buf is not None:
-            img = Image.open(buf)
-            img.load()
+            if timer:
+                timer.add("io", t)
+            return self.decode(buf, self._resize_size, self._resample, timer, crop=self.autocrop)
+        with open(path, "rb") as f:
+            return self.decode(f, self._resize_size, self._resample, crop=self.autocrop)
+
+    def _resize_size(self, w: int, h: int) -> tuple[int, int]:
+        """Size `_decode_image` resizes a w x h image to.
+
+        long-side: cap the long side at `max_side`, preserving aspect ratio; the
+        processor then resizes again to its patch grid.
+        grid: go straight to the size the processor would end up with, so the image
+        is resampled once and the processor is told not to resize.
+        """
+        m = max(w, h)
+        max_side = self.max_side
+        if max_side and m > max_side:
+            scale = max_side / float(m)
+            w, h = int(w * scale), int(h * scale)
+        if self.resize_mode == "grid":
+            h, w = self._smart_resize(w, h)
+        return w, h
+
+    def _grid_config(self) -> tuple[int, int, int, int]:
+        """(patch_size, merge_size, min_pixels, max_pixels) of the processor's image resize."""
+        ip = self.processor.image_processor
+        size = getattr(ip, "size", None) or {}
+        min_pixels = size.get("shortest_edge") or getattr(ip, "min_pixels", None)
+        max_pixels = size.get("longest_edge") or getattr(ip, "max_pixels", None)
+        return int(ip.patch_size), int(ip.merge_size), int(min_pixels), int(max_pixels)
+
+    def _smart_resize(self, w: int, h: int) -> tuple[int, int]:
+        """(height, width) the processor resizes a w x h image to: multiples of patch x merge within its pixel limits."""
+        from transformers.models.qwen2_vl.image_processing_qwen2_vl import smart_resize
+
+        patch, merge, min_pixels, max_pixels = self._grid_config()
+        return smart_resize(h, w, factor=patch * merge, min_pixels=min_pixels, max_pixels=max_pixels)
+
+    def image_grid(self, image_value: Any) -> tuple[int, int, int]:
+        """image_grid_thw the processor will produce for an image, read from its header only.
+
+        With autocrop the size depends on the pixels, so the image is loaded (from
+        the image cache when there is one).
+        """
+        if self.autocrop:
+            w, h = self._load_image(image_value).size
         else:
-            if not path:
-                raise FileNotFoundError(
-                    "Empty image path in dataset record (did you include missing-image docs?)"
-                )
-            with open(path, "rb") as f:
-                img = Image.open(f)
-                img.load()
+            path, buf = self._coerce_image_source(image_value)
+            if buf is None and not path:
+                raise FileNotFoundError("Empty image path in dataset record")
+            with (buf if buf is not None else open(path, "rb")) as f, Image.open(f) as img:
+                w, h = self._resize_size(*img.size)
+        patch = self._grid_config()[0]
+        rh, rw = self._smart_resize(w, h)
+        return 1, rh // patch, rw // patch
+
+    def image_tokens(self, image_value: Any) -> int:
+        """Image placeholder tokens the processor expands an image to (see `image_grid`)."""
+        t, gh, gw = self.image_grid(image_value)
+        return t * gh * gw // self._grid_config()[1] ** 2
+
+    def render_text(self, prompt: str, response: str) -> str:
+        """Chat text for one record, using the model's chat template when available."""
+        msgs = build_chat_messages(prompt, response)
+        if hasattr(self.processor, "apply_chat_template"):
+            return self.processor.apply_chat_template(msgs, tokenize=False, add_generation_prompt=False)
+        # fallback: concatenate
+        return f"USER: {prompt}\nASSISTANT: {response}"
+
+    def sequence_lengths(self, features: Iterable[dict[str, Any]], batch_size: int = 256) -> list[int]:
+        """Unpadded sequence length (text + image tokens, capped at max_length) of each record.
+
+        Uses the token cache when it has the record; otherwise reads the image header
+        and tokenizes the rendered text in batches.
+        """
+        tok = self.processor.tokenizer
+        image_token = getattr(self.processor, "image_token", "<|image_pad|>")
+        image_token_id = tok.convert_tokens_to_ids(image_token)
+        lengths: list[int] = []
+        pending: list[tuple[int, str, int]] = []
+
+        def flush() -> None:
+            enc = tok([text for _, text, _ in pending])["input_ids"]
+            for (i, _, n_img), ids in zip(pending, enc):
+                lengths[i] = min(self.max_length, len(ids) - ids.count(image_token_id) + n_img)
+            pending.clear()
+
+        for f in features:
+            cached = self.token_cache.get(f) if self.token_cache is not None else None
+            if cached is not None:
+                lengths.append(len(cached[0]))
+                continue
+            lengths.append(self.max_length)
+            try:
+                n_img = self.image_tokens(f.get("image"))
+            except Exception:
+                # unreadable here; keep the conservative max_length
+                continue
+            text = self.render_text(str(f["prompt"]), str(f["response"]))
+            pending.append((len(lengths) - 1, text, n_img))
+            if len(pending) >= batch_size:
+                flush()
+        if pending:
+            flush()
+        return lengths
+
+    def _image_kwargs(self) -> dict[str, Any]:
+        # grid mode: images already have the processor's final size
+        return {"do_resize": False} if self.resize_mode == "grid" else {}
+
+    def _collate_cached(
+        self, images: list[Image.Image], cached: list[tuple[Any, Any, tuple[int, int, int]]]
+    ) -> dict[str, torch.Tensor] | None:
+        """Batch from pre-tokenized records: run the image processor, then pad and stack."""
+        timer = self.stage_timer
+        t = time.perf_counter() if timer else 0.0
+        enc = self.processor.image_processor(images=images, return_tensors="pt", **self._image_kwargs())
+        image_grid_thw = enc["image_grid_thw"]
+        if [tuple(g) for g in image_grid_thw.tolist()] != [tuple(c[2]) for c in cached]:
+            # an image changed size since the cache was built
+            return None
+        if timer:
+            t = timer.add("processor", t, len(cached))
+
+        tok = self.processor.tokenizer
+        pad_token_id = tok.pad_token_id if tok.pad_token_id is not None else 0
+        longest = max(len(c[0]) for c in cached)
+        input_ids = torch.full((len(cached), longest), pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(cached), longest), dtype=torch.long)
+        labels = torch.full((len(cached), longest), -100, dtype=torch.long)
+        left = getattr(tok, "padding_side", "right") == "left"
+        for i, (ids, mask, _) in enumerate(cached):
+            n = len(ids)
+            sl = slice(longest - n, longest) if left else slice(0, n)
+            row = torch.from_numpy(ids.astype("int64"))
+            input_ids[i, sl] = row
+            attention_mask[i, sl] = 1
+            labels[i, sl] = row.masked_fill(torch.from_numpy(mask == 0), -100)
+        if timer:
+            timer.add("tensors", t, len(cached))
+        return {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "labels": labels,
+            "pixel_values": enc["pixel_values"],
+            "image_grid_thw": image_grid_thw,
+        }
 
-        img = img.convert("RGB")
-        # Resize by long-side while preserving aspect ratio
-        w, h = img.size
-        m = max(w, h)
-        if self.image_max_side and m > self.image_max_side:
-            scale = self.image_max_side / float(m)
-            nw, nh = int(w * scale), int(h * scale)
-            img = img.resize((nw, nh))
-        return img
-
-    def __call__(self, features: list[dict[str, Any]]) -> dict[str, torch.Tensor]:
-        images = [self._load_image(f.get("image")) for f in features]
-        prompts = [str(f["prompt"]) for f in features]
-        responses = [str(f["response"]) for f in features]
-
-        # Build chat text using the model's chat template when available.
-        texts: list[str] = []
-        for p, r in zip(prompts, responses, strict=True):
-            msgs = build_chat_messages(p, r)
-            if hasattr(self.processor, "apply_chat_template"):
-                text = self.processor.apply_chat_template(
-                    msgs, tokenize=False, add_generation_prompt=False
-                )
-            else:
-                # fallback: concatenate
-                text = f"USER: {p}\nASSISTANT: {r}"
-            texts.append(text)
+    def __call__(
+        self, features: list[dict[str, Any]], images: list[Image.Image] | None = None
+    ) -> dict[str, torch.Tensor]:
+        """Collate `features`; `images` are their already loaded images (see `prefetch.py`), if any."""
+        batch = self._collate(features, images)
+        timer = self.stage_timer
+        if self.pack:
+            t = time.perf_counter() if timer else 0.0
+            tok = self.processor.tokenizer
+            image_token = getattr(self.processor, "image_token", "<|image_pad|>")
+            batch = pack_batch(
+                batch,
+                self.max_length,
+                pad_token_id=tok.pad_token_id if tok.pad_token_id is not None else 0,
+                merge=self._grid_config()[1],
+                image_token_id=tok.convert_tokens_to_ids(image_token),
+            )
+            if timer:
+                timer.add("tensors", t, len(features))
+        if timer:
+            # popped by Qwen3VLTrainer before the forward pass
+            batch["stage_times"] = timer.drain()  # type: ignore[assignment]
+        return batch
+
+    def _collate(
+        self, features: list[dict[str, Any]], images: list[Image.Image] | None = None
+    ) -> dict[str, torch.Tensor]:
+        if images is None:
+            images = [self._load_image(f.get("image")) for f in features]
+
+        if self.token_cache is not None and self._at_full_side():
+            cached = [self.token_cache.get(f) for f in features]
+            if all(c is not None for c in cached):
+                batch = self._collate_cached(images, cached)  # type: ignore[arg-type]
+                if batch is not None:
+                    return batch
+
+        timer = self.stage_timer
+        t = time.perf_counter() if timer else 0.0
+        texts = [self.render_text(str(f["prompt"]), str(f["response"])) for f in features]
+        if timer:
+            t = timer.add("template", t, len(features))
 
         enc = self.processor(
             text=texts,
@@ -151,7 +452,10 @@ class Collator:
             padding=True,
             truncation=True,
             max_length=self.max_length,
+            **self._image_kwargs(),
         )
+        if timer:
+            t = timer.add("processor", t, len(features))
 
         input_ids = enc["input_ids"]
         attention_mask = enc.get("attention_mask")
@@ -178,20 +482,148 @@ class Collator:
             batch["image_grid_thw"] = image_grid_thw
         if image_attention_mask is not None:
             batch["image_attention_mask"] = image_attention_mask
+        if timer:
+            timer.add("tensors", t, len(features))
         return batch
 
 
+class Qwen3VLTrainer(Trainer):
+    """Trainer whose train dataloader can use a custom batch sampler and thread-pool image prefetching.
+
+    With a `stage_log`, collator stage timings travelling in `batch["stage_times"]`
+    are collected and summarised in every log line. With a `throughput` callback,
+    every fetched batch and the time spent waiting for it are passed to it.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        train_batch_sampler: Any = None,
+        prefetch_threads: int = 0,
+        prefetch_batches: int = 4,
+        stage_log: StageLog | None = None,
+        throughput: ThroughputCallback | None = None,
+        **kwargs: Any,
+    ):
+        super().__init__(*args, **kwargs)
+        self.train_batch_sampler = train_batch_sampler
+        self.prefetch_threads = prefetch_threads
+        self.prefetch_batches = prefetch_batches
+        if prefetch_threads and self.accelerator.dispatch_batches is not False:
+            raise ValueError("prefetch_threads needs TrainingArguments(accelerator_config={'dispatch_batches': False})")
+        self.stage_log = stage_log
+        self.throughput = throughput
+        if throughput is not None:
+            self.add_callback(throughput)
+
+    def get_batch_samples(self, epoch_iterator: Any, num_batches: int, *args: Any, **kwargs: Any) -> Any:
+        t = time.perf_counter()
+        batch_samples, num_items_in_batch = super().get_batch_samples(epoch_iterator, num_batches, *args, **kwargs)
+        if self.throughput is not None:
+            self.throughput.observe(batch_samples, time.perf_counter() - t)
+        return batch_samples, num_items_in_batch
+
+    def training_step(self, model: Any, inputs: dict[str, Any], *args: Any, **kwargs: Any) -> torch.Tensor:
+        stage_times = inputs.pop("stage_times", None)
+        if stage_times and self.stage_log is not None:
+            self.stage_log.update(stage_times, self.state.global_step)
+        return super().training_step(model, inputs, *args, **kwargs)
+
+    def prediction_step(self, model: Any, inputs: dict[str, Any], *args: Any, **kwargs: Any) -> Any:
+        inputs.pop("stage_times", None)
+        return super().prediction_step(model, inputs, *args, **kwargs)
+
+    def log(self, logs: dict[str, float], *args: Any, **kwargs: Any) -> None:
+        if self.stage_log is not None and "loss" in logs:
+            logs = {**logs, **self.stage_log.summary()}
+        super().log(logs, *args, **kwargs)
+
+    def get_eval_dataloader(self, eval_dataset: Any = None) -> DataLoader:
+        collator = self.data_collator
+        if getattr(collator, "resolution", None) is not None or getattr(collator, "stage_timer", None) is not None:
+            # Evaluate at the full image size (and with the caches) whatever the resolution schedule's current side;
+            # the shared side itself stays put, since train batches may still be built ahead. No stage timing either.
+            self.data_collator = copy.copy(collator)
+            self.data_collator.resolution = None
+            self.data_collator.stage_timer = None
+        try:
+            return super().get_eval_dataloader(eval_dataset)
+        finally:
+            self.data_collator = collator
+
+    def get_train_dataloader(self) -> DataLoader:
+        if self.train_batch_sampler is None and not self.prefetch_threads:
+            return super().get_train_dataloader()
+        if self.train_batch_sampler is not None:
+            batching: dict[str, Any] = {"batch_sampler": self.train_batch_sampler}
+        elif isinstance(self.train_dataset, torch.utils.data.IterableDataset):
+            batching = {"batch_size": self._train_batch_size}
+        else:
+            # the per-epoch seeded sampler accelerate would substitute, so a resume skips the same batches
+            batching = {
+                "batch_size": self._train_batch_size,
+                "sampler": SeedableRandomSampler(self.train_dataset, data_seed=self.args.data_seed),
+                "drop_last": self.args.dataloader_drop_last,
+            }
+        loader = DataLoader(
+            self.train_dataset,
+            collate_fn=collate_features if self.prefetch_threads else self.data_collator,
+            num_workers=self.args.dataloader_num_workers,
+            pin_memory=self.args.dataloader_pin_memory and not self.prefetch_threads,
+            **batching,
+        )
+        if self.prefetch_threads:
+            # The raw loader stays unprepared and is read by the prefetch threads; accelerate prepares the loader
+            # over the finished batches, which the training loop iterates on the main thread as usual.
+            batches = PrefetchBatches(
+                loader, self.data_collator, threads=self.prefetch_threads, batches=self.prefetch_batches
+            )
+            pin = self.args.dataloader_pin_memory
+            loader = DataLoader(batches, batch_size=None, collate_fn=unbatched, pin_memory=pin)
+        return self.accelerator.prepare(loader)
+
+
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--model", default="Qwen/Qwen3-VL-8B-Instruct")
-    ap.add_argument("--train", required=True, help="path to train jsonl")
+    ap.add_argument(
+        "--train", required=True, help="path to train jsonl (or a glob such as 'shards/train-*.jsonl')"
+    )
     ap.add_argument("--val", default="", help="path to val jsonl")
     ap.add_argument("--out", default="outputs/qwen3vl-8b-qlora")
     ap.add_argument("--epochs", type=float, default=1.0)
+    ap.add_argument("--max-steps", type=int, default=0, help="optimizer steps to train; overrides --epochs (0 = off)")
+    ap.add_argument(
+        "--streaming",
+        action="store_true",
+        help="read the train JSONL shards lazily through a shuffle buffer instead of building an Arrow cache "
+        "first; needs --max-steps",
+    )
+    ap.add_argument("--shuffle-buffer", type=int, default=1000, help="records held for shuffling with --streaming")
+    ap.add_argument("--seed", type=int, default=42)
     ap.add_argument("--lr", type=float, default=1e-4)
     ap.add_argument("--batch", type=int, default=1)
     ap.add_argument("--grad-accum", type=int, default=16)
     ap.add_argument("--max-len", type=int, default=4096)
+    ap.add_argument(
+        "--token-budget",
+        type=int,
+        default=0,
+        help="padded tokens per batch (batch size x longest sample); replaces --batch for training. 0 = off",
+    )
+    ap.add_argument("--budget-window", type=int, default=1024, help="samples sorted together by --token-budget")
+    ap.add_argument(
+        "--pack",
+        action="store_true",
+        help="pack each batch's samples into as few --max-len rows as fit (attention stays within a sample); "
+        "raise --batch to fill the rows",
+    )
+    ap.add_argument(
+        "--attn-impl",
+        default="",
+        choices=["", "eager", "sdpa", "flash_attention_2"],
+        help="attention implementation passed to from_pretrained ('' = model default)",
+    )
     ap.add_argument("--image-max-side", type=int, default=1536)
     ap.add_argument("--lora-r", type=int, default=16)
     ap.add_argument("--lora-alpha", type=int, default=32)
@@ -204,6 +636,64 @@ def main() -> None:
         default=0,
         help="PyTorch dataloader workers for image preprocessing (try 4).",
     )
+    ap.add_argument(
+        "--prefetch-threads",
+        type=int,
+        default=0,
+        help="decode images in this many threads of the main process instead of worker processes. 0 = off",
+    )
+    ap.add_argument(
+        "--prefetch-batches",
+        type=int,
+        default=4,
+        help="batches whose images are decoded ahead of the collator (--prefetch-threads)",
+    )
+    ap.add_argument(
+        "--resolution-schedule",
+        default="",
+        help="train early steps at smaller image sizes, e.g. '768:0.3,1024:0.6' = 768 px for the first 30%% "
+        "of steps, 1024 px until 60%%, then --image-max-side",
+    )
+    ap.add_argument(
+        "--metrics-file",
+        default="",
+        help="JSONL file for throughput/padding/memory metrics per logging step (default: <out>/metrics.jsonl)",
+    )
+    ap.add_argument(
+        "--stage-timing",
+        default="",
+        help="time the collator stages, add mean/p95 ms per sample to the logs and write the timeline "
+        "to this .json or .csv file",
+    )
+    ap.add_argument(
+        "--decoder",
+        default="pil",
+        choices=sorted(DECODERS),
+        help="image decode backend (see image_decode.py); 'draft' decodes JPEGs near the target size",
+    )
+    ap.add_argument(
+        "--resize-mode",
+        default="long-side",
+        choices=["long-side", "grid"],
+        help="long-side: cap at --image-max-side, processor resizes again; "
+        "grid: resize once to the processor's patch grid and skip its resize",
+    )
+    ap.add_argument("--resample", default="bicubic", choices=sorted(RESAMPLING), help="resize filter")
+    ap.add_argument(
+        "--autocrop",
+        action="store_true",
+        help="crop blank page margins and scanner bed off each image before resizing (see image_crop.py)",
+    )
+    ap.add_argument(
+        "--image-cache",
+        default="",
+        help="directory built by training/image_cache.py (same --image-max-side); '' decodes every step",
+    )
+    ap.add_argument(
+        "--token-cache",
+        default="",
+        help="directory built by training/token_cache.py (same --model/--max-len/--image-max-side); '' tokenizes every step",
+    )
     ap.add_argument(
         "--no-grad-checkpointing",
         action="store_true",
@@ -213,37 +703,45 @@ def main() -> None:
 
     os.makedirs(args.out, exist_ok=True)
 
-    dataset = load_dataset(
-        "json",
-        data_files={
-            "train": args.train,
-            **({"validation": args.val} if args.val else {}),
-        },
-    )
+    if args.streaming:
+        if not args.max_steps:
+            raise SystemExit("--streaming needs --max-steps (the number of records is not known up front)")
+        if args.token_budget:
+            raise SystemExit("--token-budget needs every record's length up front; it does not work with --streaming")
+
+    data_files = {"validation": args.val} if args.val else {}
+    if args.streaming:
+        # records are read lazily from the JSONL shards; no Arrow cache is built
+        train_dataset = load_dataset("json", data_files={"train": args.train}, split="train", streaming=True)
+    else:
+        data_files = {"train": args.train, **data_files}
+    dataset = load_dataset("json", data_files=data_files) if data_files else DatasetDict()
 
     # Drop records with missing/invalid images (common when train.jsonl was built without --skip-missing-images).
     # We keep this in-script so training can proceed without rebuilding the dataset.
-    def _has_valid_image(ex: dict[str, Any]) -> bool:
-        v = ex.get("image")
-        if v is None:
-            return False
-        if isinstance(v, str) and not v.strip():
-            return False
-        try:
-            p = Path(str(v))
-        except Exception:
-            return False
-        if str(p) in {"", "."}:
-            return False
-        if not p.is_absolute():
-            p = (Path.cwd() / p).resolve()
-        return p.exists() and p.is_file()
-
-    before_train = len(dataset["train"])
-    dataset["train"] = dataset["train"].filter(_has_valid_image)
-    after_train = len(dataset["train"])
-    if after_train != before_train:
-        print(f"Filtered train records with missing images: {before_train} -> {after_train}")
+    if args.streaming:
+        # filtered lazily, as records stream past
+        train_dataset = train_dataset.filter(_has_valid_image).shuffle(seed=args.seed, buffer_size=args.shuffle_buffer)
+        world_size = int(os.environ.get("WORLD_SIZE", "1"))
+        if train_dataset.num_shards < world_size:
+            # accelerate would fall back to IterableDatasetShard: every rank reads and filters the whole stream
+            raise SystemExit(
+                f"--streaming: {train_dataset.num_shards} shard(s) for {world_size} GPUs; split the train JSONL into "
+                "at least one file per GPU"
+            )
+        readers = max(1, args.num_workers) * world_size
+        if train_dataset.num_shards < readers:
+            print(
+                f"--streaming: {train_dataset.num_shards} shard(s) for {readers} reader(s) (GPUs x workers); "
+                "split the train JSONL into at least that many files or some readers stay idle"
+            )
+    else:
+        before_train = len(dataset["train"])
+        dataset["train"] = dataset["train"].filter(_has_valid_image)
+        after_train = len(dataset["train"])
+        if after_train != before_train:
+            print(f"Filtered train records with missing images: {before_train} -> {after_train}")
+        train_dataset = dataset["train"]
 
     if "validation" in dataset:
         before_val = len(dataset["validation"])
@@ -252,6 +750,30 @@ def main() -> None:
         if after_val != before_val:
             print(f"Filtered val records with missing images: {before_val} -> {after_val}")
 
+    resolution = None
+    if args.resolution_schedule:
+        try:
+            stages = parse_schedule(args.resolution_schedule, args.image_max_side)
+        except ValueError as e:
+            raise SystemExit(str(e)) from None
+        resolution = ResolutionSchedule(stages, args.image_max_side)
+
+    if args.prefetch_threads and args.num_workers:
+        raise SystemExit("Use either --prefetch-threads or --num-workers, not both")
+    if args.prefetch_threads and int(os.environ.get("WORLD_SIZE", "1")) > 1:
+        # the prefetched batches are not split across ranks; every GPU would train on the same stream
+        raise SystemExit("--prefetch-threads is for single-GPU training; use --num-workers with several GPUs")
+
+    if args.pack and args.attn_impl != "flash_attention_2":
+        # sdpa/eager only isolate packed samples when the mask is built from restarting position ids
+        import transformers.masking_utils as masking_utils
+
+        torch_version = tuple(int(x) for x in torch.__version__.split(".")[:2])
+        if not hasattr(masking_utils, "find_packed_sequence_indices") or torch_version < (2, 6):
+            raise SystemExit(
+                "--pack needs --attn-impl flash_attention_2, or transformers with packed-sequence masks and torch>=2.6"
+            )
+
     processor = AutoProcessor.from_pretrained(args.model, trust_remote_code=True)
 
     # QLoRA: load 4-bit base
@@ -261,6 +783,7 @@ def main() -> None:
         torch_dtype=torch.float16,
         trust_remote_code=True,
         load_in_4bit=True,
+        **({"attn_implementation": args.attn_impl} if args.attn_impl else {}),
     )
 
     # PEFT helper often enables gradient checkpointing by default (saves VRAM, costs speed).
@@ -294,13 +817,45 @@ def main() -> None:
     model = get_peft_model(model, lora)
 
     collator = Collator(
-        processor=processor, image_max_side=args.image_max_side, max_length=args.max_len
+        processor=processor,
+        image_max_side=args.image_max_side,
+        max_length=args.max_len,
+        pack=args.pack,
+        decoder=args.decoder,
+        resize_mode=args.resize_mode,
+        resample=args.resample,
+        resolution=resolution,
+        autocrop=args.autocrop,
     )
+    if args.image_cache:
+        cache = ImageCache.open(Path(args.image_cache))
+        if cache.settings != collator.image_settings():
+            print(
+                f"Ignoring image cache {args.image_cache}: built with {cache.settings}, "
+                f"training uses {collator.image_settings()}"
+            )
+        else:
+            collator.image_cache = cache
+            print(f"Using image cache {args.image_cache} ({len(cache.entries)} image(s))")
+    if args.token_cache:
+        tcache = TokenCache.open(Path(args.token_cache))
+        if tcache.settings != collator.token_settings():
+            stale = sorted(
+                k
+                for k in set(tcache.settings) | set(collator.token_settings())
+                if tcache.settings.get(k) != collator.token_settings().get(k)
+            )
+            print(f"Ignoring stale token cache {args.token_cache}: settings differ in {', '.join(stale)}")
+        else:
+            collator.token_cache = tcache
+            print(f"Using token cache {args.token_cache} ({len(tcache.entries)} record(s))")
 
     # Transformers API compat: newer versions renamed `evaluation_strategy` -> `eval_strategy`.
     targs_kwargs: dict[str, Any] = {
         "output_dir": args.out,
         "num_train_epochs": args.epochs,
+        "max_steps": args.max_steps or -1,
+        "seed": args.seed,
         "learning_rate": args.lr,
         "per_device_train_batch_size": args.batch,
         "per_device_eval_batch_size": 1,
@@ -316,6 +871,10 @@ def main() -> None:
         "report_to": "none",
         "remove_unused_columns": False,
     }
+    if args.streaming or args.prefetch_threads:
+        # streaming: each rank reads its own share of the shards instead of rank 0 reading and broadcasting every
+        # batch; prefetching: the loader yields whole batches, which must not be sliced and re-batched
+        targs_kwargs["accelerator_config"] = {"dispatch_batches": False}
 
     sig_params = set(inspect.signature(TrainingArguments.__init__).parameters)
     if "evaluation_strategy" not in sig_params and "eval_strategy" in sig_params:
@@ -326,15 +885,52 @@ def main() -> None:
 
     targs = TrainingArguments(**targs_kwargs)
 
-    trainer = Trainer(
+    batch_sampler = None
+    if args.token_budget:
+        lengths = collator.sequence_lengths(train_dataset)
+        batch_sampler = TokenBudgetBatchSampler(
+            lengths, args.token_budget, seed=targs.seed, window=args.budget_window
+        )
+        fixed = fixed_size_batches(len(lengths), args.batch, seed=targs.seed)
+        print(
+            f"Padding ratio: --batch {args.batch}: {padding_ratio(fixed, lengths):.1%} ({len(fixed)} batches) -> "
+            f"--token-budget {args.token_budget}: {padding_ratio(batch_sampler.batches(), lengths):.1%} "
+            f"({len(batch_sampler)} batches)"
+        )
+
+    stage_log = None
+    if args.stage_timing:
+        # attached after sequence_lengths so only training batches are timed
+        collator.stage_timer = StageTimer()
+        stage_log = StageLog()
+
+    tok = processor.tokenizer
+    throughput = ThroughputCallback(
+        Path(args.metrics_file or Path(args.out) / "metrics.jsonl"),
+        image_token_id=tok.convert_tokens_to_ids(getattr(processor, "image_token", "<|image_pad|>")),
+        pad_token_id=tok.pad_token_id if tok.pad_token_id is not None else 0,
+    )
+
+    trainer = Qwen3VLTrainer(
         model=model,
         args=targs,
-        train_dataset=dataset["train"],
+        train_dataset=train_dataset,
         eval_dataset=dataset.get("validation"),
         data_collator=collator,
+        train_batch_sampler=batch_sampler,
+        prefetch_threads=args.prefetch_threads,
+        prefetch_batches=args.prefetch_batches,
+        stage_log=stage_log,
+        throughput=throughput,
+        callbacks=[resolution] if resolution is not None else None,
     )
 
-    trainer.train()
+    try:
+        trainer.train()
+    finally:
+        if stage_log is not None:
+            stage_log.export(Path(args.stage_timing))
+            print(f"Stage timings -> {args.stage_timing}")
     trainer.save_model(args.out)
 
     # Save a minimal adapter config artifact for serving
@@ -344,6 +940,9 @@ def main() -> None:
                 "base_model": args.model,
                 "method": "qlora",
                 "image_max_side": args.image_max_side,
+                "resolution_schedule": args.resolution_schedule,
+                # inference must crop the same way (image_crop.crop_margins) when this is set
+                "autocrop": args.autocrop,
                 "max_len": args.max_len,
             },
             indent=2,
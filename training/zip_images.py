@@ -0,0 +1,170 @@
+"""Read training images directly from zip archives.
+
+Image fields may point inside an archive instead of an extracted file:
+
+  zip://data/combined.zip#path/in/zip.jpg
+
+Archives are opened lazily and cached per process (DataLoader workers each get
+their own handles; a forked worker never reuses its parent's file offsets).
+The central directory is indexed once per archive. Members stored without
+compression (typical for JPEG scans) are served straight from an mmap of the
+archive; deflated members go through `zipfile`.
+"""
+
+import io
+import mmap
+import os
+import struct
+import threading
+import zipfile
+from pathlib import Path
+from typing import BinaryIO
+
+ZIP_SCHEME = "zip://"
+
+_LOCAL_HEADER_SIG = b"PK\x03\x04"
+_LOCAL_HEADER_SIZE = 30
+
+
+def is_zip_uri(value: str) -> bool:
+    return value.startswith(ZIP_SCHEME)
+
+
+def parse_zip_uri(value: str) -> tuple[Path, str]:
+    """Split `zip://<archive>#<member>` into (archive path resolved against CWD, member)."""
+    rest = value[len(ZIP_SCHEME) :]
+    archive, sep, member = rest.partition("#")
+    if not sep or not archive or not member:
+        raise ValueError(f"Invalid zip image URI (expected zip://<archive>#<member>): {value!r}")
+    p = Path(archive)
+    if not p.is_absolute():
+        p = (Path.cwd() / p).resolve()
+    return p, member
+
+
+class _ViewReader(io.RawIOBase):
+    """Seekable read-only file object over a memoryview (no copy of the member)."""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:  # type: ignore[override]
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos : self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = len(self._view) + offset
+        else:
+            raise ValueError(f"invalid whence: {whence}")
+        self._pos = max(0, self._pos)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+class ZipArchive:
+    """One open archive: a name -> ZipInfo index, a ZipFile handle and an mmap."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._zf = zipfile.ZipFile(path)
+        self.index = {info.filename: info for info in self._zf.infolist() if not info.is_dir()}
+        self._file = path.open("rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._lock = threading.Lock()
+
+    def __contains__(self, member: str) -> bool:
+        return member in self.index
+
+    def _stored_view(self, info: zipfile.ZipInfo) -> memoryview:
+        off = info.header_offset
+        if self._mm[off : off + 4] != _LOCAL_HEADER_SIG:
+            raise zipfile.BadZipFile(f"Bad local header for {info.filename!r} in {self.path}")
+        name_len, extra_len = struct.unpack_from("<HH", self._mm, off + 26)
+        start = off + _LOCAL_HEADER_SIZE + name_len + extra_len
+        return memoryview(self._mm)[start : start + info.file_size]
+
+    def open(self, member: str) -> BinaryIO:
+        info = self.index.get(member)
+        if info is None:
+            raise FileNotFoundError(f"{member!r} not found in {self.path}")
+        if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+            return _ViewReader(self._stored_view(info))  # type: ignore[return-value]
+        # ZipFile.read shares one file handle; serialize within the process.
+        with self._lock:
+            data = self._zf.read(info)
+        return io.BytesIO(data)
+
+    def close(self) -> None:
+        self._zf.close()
+        try:
+            self._mm.close()
+        except BufferError:
+            # a view is still alive; the mapping is released when it is collected
+            pass
+        self._file.close()
+
+
+_archives: dict[Path, ZipArchive] = {}
+_archives_pid = os.getpid()
+_archives_lock = threading.Lock()
+
+
+def get_archive(path: Path) -> ZipArchive:
+    """Return the cached archive for this process, opening (and indexing) it on first use."""
+    global _archives_pid
+    with _archives_lock:
+        if _archives_pid != os.getpid():
+            # forked DataLoader worker: drop the parent's handles without closing them
+            _archives.clear()
+            _archives_pid = os.getpid()
+        arc = _archives.get(path)
+        if arc is None:
+            arc = _archives[path] = ZipArchive(path)
+        return arc
+
+
+def open_zip_image(uri: str) -> BinaryIO:
+    archive, member = parse_zip_uri(uri)
+    if not archive.is_file():
+        raise FileNotFoundError(f"Archive not found: {archive}")
+    return get_archive(archive).open(member)
+
+
+def source_stat(path: str) -> tuple[int, int]:
+    """(size, mtime_ns) of an image file, or for a zip:// URI the member's size and the
+    archive's mtime; keys caches of per-image results."""
+    if is_zip_uri(path):
+        archive, member = parse_zip_uri(path)
+        st = os.stat(archive)
+        return get_archive(archive).index[member].file_size, st.st_mtime_ns
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns
+
+
+def zip_member_exists(uri: str) -> bool:
+    try:
+        archive, member = parse_zip_uri(uri)
+    except ValueError:
+        return False
+    if not archive.is_file():
+        return False
+    try:
+        return member in get_archive(archive)
+    except (OSError, zipfile.BadZipFile):
+        return False